@@ -0,0 +1,86 @@
+"""Time reading a full athena profile with resp.json() against ijson streaming.
+
+Usage: python benchmarks/bench_athena_parse.py [athena.json[.gz]]
+
+Without arguments the synthetic profile in tests/fixtures is used (5,666
+cosmetics, 3,000 quests). It is served from a local aiohttp server, read
+both ways, and run through the parse_* helpers fetch_profile_snapshot uses;
+the parsed results are compared. Peak memory is measured with tracemalloc
+in a separate pass so it does not skew the timings.
+"""
+import asyncio
+import gzip
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import ClientSession, web
+
+import src.fortnite_api as fortnite_api
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       "tests", "fixtures", "athena_profile.json.gz")
+ROUNDS = 5
+
+
+def load_body(path: str) -> bytes:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        return f.read()
+
+
+def parse(athena: dict) -> tuple:
+    return (
+        fortnite_api.parse_locker_items(athena),
+        fortnite_api.parse_account_stats(athena),
+        fortnite_api.parse_locker_state(athena),
+    )
+
+
+async def read(http: ClientSession, url: str, mode: str) -> tuple:
+    async with http.post(url) as resp:
+        athena = await resp.json() if mode == "json" else await fortnite_api._stream_athena(resp)
+    return parse(athena)
+
+
+async def main() -> None:
+    if fortnite_api.ijson is None:
+        sys.exit("ijson is not installed")
+    body = load_body(sys.argv[1] if len(sys.argv) > 1 else FIXTURE)
+
+    async def handler(request):
+        return web.Response(body=body, content_type="application/json")
+
+    app = web.Application()
+    app.router.add_post("/athena", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/athena"
+
+    try:
+        async with ClientSession() as http:
+            results = {}
+            for mode in ("json", "stream"):
+                results[mode] = await read(http, url, mode)
+                started = time.perf_counter()
+                for _ in range(ROUNDS):
+                    await read(http, url, mode)
+                elapsed = (time.perf_counter() - started) * 1000 / ROUNDS
+
+                tracemalloc.start()
+                await read(http, url, mode)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"{mode:6s} {len(body) / 2**20:4.1f} MiB body: {elapsed:7.1f} ms, peak {peak / 2**20:5.1f} MiB")
+            print("identical:", results["json"] == results["stream"])
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+"""Compare the templateId-prefix classifier with the substring heuristic it replaced.
+
+Usage: python benchmarks/bench_classify.py [ids file]
+
+Without arguments skins.txt is used. Every id is classified both as a
+bare id (get_cosmetic_type) and as the athena item map a profile would
+hold, with a templateId built from the category the new classifier picks.
+Ids the two classifiers disagree on are listed by (old, new) category,
+then both are timed; the memoized functions cold and warm.
+"""
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.config import classify_items, classify_template, get_cosmetic_type
+
+ROUNDS = 20
+
+# The profile parser's filter before classify_items.
+OLD_ID_PATTERN = re.compile(r"athena(.*?):(.*?)_(.*?)")
+
+# Category -> a templateId prefix Epic uses for it, to build a profile.
+TEMPLATES = {
+    "Skins": "AthenaCharacter",
+    "Back Blings": "AthenaBackpack",
+    "Pickaxes": "AthenaPickaxe",
+    "Emotes": "AthenaDance",
+    "Sprays": "AthenaDance",
+    "Others": "AthenaDance",
+    "Gliders": "AthenaGlider",
+    "Wraps": "AthenaItemWrap",
+}
+
+
+def old_cosmetic_type(cosmetic_id: str) -> str:
+    """get_cosmetic_type before the prefix tables."""
+    cid = cosmetic_id.lower()
+    if "character_" in cid or "cid_" in cid:
+        return "Skins"
+    elif "bid_" in cid or "backpack" in cid:
+        return "Back Blings"
+    elif (
+        "pickaxe_" in cid or "pickaxe_id_" in cid or
+        "defaultpickaxe" in cid or "halloweenscythe" in cid
+    ):
+        return "Pickaxes"
+    elif "eid" in cid or "emote" in cid:
+        return "Emotes"
+    elif "glider" in cid or "founderumbrella" in cid or "founderglider" in cid or "solo_umbrella" in cid:
+        return "Gliders"
+    elif cid.startswith("banner_"):
+        return "Banners"
+    elif "wrap" in cid:
+        return "Wraps"
+    elif "spray" in cid:
+        return "Sprays"
+    else:
+        return "Others"
+
+
+def old_classify_items(items: dict) -> dict[str, list[str]]:
+    """parse_locker_items before classify_items; it typed the whole templateId."""
+    grouped: dict[str, list[str]] = {}
+    for item in items.values():
+        tid = item.get("templateId", "").lower()
+        if "loadingscreen_character_lineup" in tid:
+            continue
+        if OLD_ID_PATTERN.match(tid):
+            grouped.setdefault(old_cosmetic_type(tid), []).append(tid.split(":")[1])
+    return grouped
+
+
+def per_call_ms(fn, rounds: int = ROUNDS, before=None) -> float:
+    total = 0.0
+    for _ in range(rounds):
+        if before:
+            before()
+        started = time.perf_counter()
+        fn()
+        total += time.perf_counter() - started
+    return total * 1000 / rounds
+
+
+def clear_memo() -> None:
+    classify_template.cache_clear()
+    get_cosmetic_type.cache_clear()
+
+
+def main() -> None:
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "skins.txt")
+    with open(path, encoding="utf-8") as f:
+        ids = [line.strip() for line in f if line.strip()]
+    items = {
+        f"guid{idx}": {"templateId": f"{TEMPLATES.get(get_cosmetic_type(cid), 'AthenaDance')}:{cid}"}
+        for idx, cid in enumerate(ids)
+    }
+
+    changed = Counter()
+    examples: dict[tuple[str, str], list[str]] = {}
+    for cid in ids:
+        old, new = old_cosmetic_type(cid), get_cosmetic_type(cid)
+        if old != new:
+            changed[old, new] += 1
+            examples.setdefault((old, new), []).append(cid)
+    print(f"{len(ids)} ids, {sum(changed.values())} classified differently:")
+    for (old, new), count in changed.most_common():
+        print(f"  {count:4d} {old} -> {new}  e.g. {', '.join(examples[old, new][:3])}")
+
+    def by_id(groups: dict[str, list[str]]) -> dict[str, str]:
+        return {cid: category for category, cids in groups.items() for cid in cids}
+
+    old_map, new_map = by_id(old_classify_items(items)), by_id(classify_items(items))
+    profile_diff = sorted(
+        (cid, old_map.get(cid), new_map.get(cid))
+        for cid in old_map.keys() | new_map.keys()
+        if old_map.get(cid) != new_map.get(cid)
+    )
+    print(f"as a profile item map, {len(profile_diff)} ids differ (None = not listed):")
+    for cid, old, new in profile_diff[:8]:
+        print(f"  {cid}: {old} -> {new}")
+
+    print(f"profile parse, old pattern + heuristic {per_call_ms(lambda: old_classify_items(items)):6.2f} ms")
+    print(f"classify_items, cold memo              {per_call_ms(lambda: classify_items(items), before=clear_memo):6.2f} ms")
+    print(f"classify_items, warm memo              {per_call_ms(lambda: classify_items(items)):6.2f} ms")
+    print(f"bare ids, old heuristic                {per_call_ms(lambda: [old_cosmetic_type(c) for c in ids]):6.2f} ms")
+    print(f"bare ids, get_cosmetic_type warm       {per_call_ms(lambda: [get_cosmetic_type(c) for c in ids]):6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Time the grid paste loop against a NumPy blend of the same tiles.
+
+Usage: python benchmarks/bench_compositor.py [item counts ...]
+
+Without arguments grids of 50, 500 and 2000 items are composed, at the
+tile size grid_layout picks for each count. Tiles are generated with a
+mix of opaque, translucent and transparent pixels like rendered cosmetics.
+The NumPy path is the one combine_images used to offer behind
+COMPOSITOR=numpy; it was removed because it never beat Image.paste. It is
+kept here so the comparison can be re-run, and its output is checked
+pixel for pixel against the paste loop. Needs numpy, which the bot does not.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from src.image_utils import grid_layout
+
+ROUNDS = 5
+BACKGROUND = (0, 0, 0, 255)
+
+
+def sample_tiles(count: int, size: int) -> list[tuple[tuple[int, int], bytes]]:
+    """A few distinct tiles cycled through, so generating them stays cheap."""
+    variants = []
+    for seed in range(8):
+        rgb = Image.radial_gradient("L").resize((size, size)).rotate(seed * 45)
+        alpha = Image.linear_gradient("L").resize((size, size)).rotate(seed * 90)
+        # Mostly opaque with soft edges, like a cosmetic on its rarity background.
+        alpha = alpha.point(lambda v: 255 if v > 64 else v * 4)
+        tile = Image.merge("RGBA", (rgb, rgb.rotate(90), rgb.rotate(180), alpha))
+        variants.append((tile.size, tile.tobytes()))
+    return [variants[idx % len(variants)] for idx in range(count)]
+
+
+def paste_grid(tiles, cols: int, rows: int, size: int) -> Image.Image:
+    """The combine_images loop."""
+    grid = Image.new("RGBA", (cols * size, rows * size), BACKGROUND)
+    for idx, (tile_size, data) in enumerate(tiles):
+        img = Image.frombytes("RGBA", tile_size, data)
+        row, col = divmod(idx, cols)
+        grid.paste(img, (col * size, row * size), img)
+    return grid
+
+
+def _div255(values):
+    # Same rounding as Pillow's DIV255 in Paste.c.
+    values = values + 128
+    return ((values >> 8) + values) >> 8
+
+
+def numpy_grid(tiles, cols: int, rows: int, size: int) -> Image.Image:
+    """The removed compositor: copy tiles into one array, blend non-opaque pixels."""
+    grid = np.zeros((rows * size, cols * size, 4), dtype=np.uint8)
+    for idx, (_, data) in enumerate(tiles):
+        row, col = divmod(idx, cols)
+        grid[row * size:(row + 1) * size, col * size:(col + 1) * size] = (
+            np.frombuffer(data, dtype=np.uint8).reshape(size, size, 4)
+        )
+    partial = np.nonzero(grid[..., 3] != 255)
+    pixels = grid[partial].astype(np.uint16)
+    alpha = pixels[:, 3:4]
+    blended = _div255(np.array(BACKGROUND, dtype=np.uint16) * (255 - alpha) + pixels * alpha)
+    # Empty cells are zero alpha, so they blend to the background like the rest.
+    grid[partial] = blended.astype(np.uint8)
+    return Image.fromarray(grid)
+
+
+def per_call_ms(fn, rounds: int = ROUNDS) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) * 1000 / rounds
+
+
+def main() -> None:
+    counts = [int(arg) for arg in sys.argv[1:]] or [50, 500, 2000]
+    for count in counts:
+        cols, rows, size = grid_layout(count)
+        tiles = sample_tiles(count, size)
+        paste = per_call_ms(lambda: paste_grid(tiles, cols, rows, size))
+        vectorized = per_call_ms(lambda: numpy_grid(tiles, cols, rows, size))
+        same = paste_grid(tiles, cols, rows, size).tobytes() == numpy_grid(tiles, cols, rows, size).tobytes()
+        print(
+            f"{count:5d} items ({cols}x{rows} @ {size}px): paste {paste:7.1f} ms, "
+            f"numpy {vectorized:7.1f} ms ({paste / vectorized:4.2f}x), identical={same}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Peak RSS of composing and encoding one gallery grid of N items.
+
+Usage: python benchmarks/bench_compositor_rss.py [item counts ...]
+
+Without arguments grids of 100, 1,000 and 5,000 items are measured. Each
+count runs in a fresh interpreter so the peaks do not mix. The child
+builds the raw RGBA tiles the way render_tiles hands them over (one list
+at the grid_layout tile size), lays them out with combine_images and
+encodes the result with encode_image, reporting ru_maxrss after imports
+and at the end. Unix only (resource module).
+"""
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+def child(count: int) -> None:
+    from PIL import Image
+
+    from src.config import LOGO_IMAGE
+    from src.encoder import encode_image
+    from src.image_utils import combine_images, grid_layout
+
+    baseline = peak_rss_mib()
+    cols, rows, size = grid_layout(count)
+    variants = []
+    for seed in range(8):
+        rgb = Image.radial_gradient("L").resize((size, size)).rotate(seed * 45)
+        tile = Image.merge("RGBA", (rgb, rgb.rotate(90), rgb.rotate(180), Image.new("L", (size, size), 255)))
+        variants.append((tile.size, tile.tobytes()))
+    # render_tiles returns one bytes object per item.
+    tiles = [(variants[idx % 8][0], bytes(variants[idx % 8][1])) for idx in range(count)]
+
+    started = time.perf_counter()
+    image = combine_images(tiles, username="bench", item_count=count, logo_path=LOGO_IMAGE)
+    del tiles
+    encoded = encode_image(image)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(
+        f"{count:5d} items ({cols}x{rows} @ {size}px, {image.width}x{image.height}): "
+        f"peak RSS {peak_rss_mib():6.1f} MiB (imports {baseline:5.1f} MiB), "
+        f"{encoded.format} {encoded.size / 2**20:4.1f} MiB in {elapsed:6.0f} ms"
+    )
+
+
+def main() -> None:
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        child(int(sys.argv[2]))
+        return
+    counts = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000]
+    for count in counts:
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(count)], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Time tile label sizing: the old shrink-by-one loop against fit_font_size.
+
+Usage: python benchmarks/bench_font_fit.py [labels]
+
+Labels are made from skins.txt ids (upper-cased like tile names, and
+longer than most display names, so nearly all of them shrink) and
+sized for a 256 px tile, as combine_with_background does. The old loop
+measured with textbbox at every point from the base size down; the new
+code binary-searches memoized measurements. Timings are per tile, with
+fonts already loaded in both cases (render workers preload them); the
+new path is shown with cold and warm measurement caches. Every label
+must get the same size from both.
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image, ImageDraw
+
+from src.image_utils import fit_font_size, get_font, measure_text
+
+TILE_WIDTH = 256
+BASE_SIZE = 40
+MIN_SIZE = 10
+
+
+def old_fit(draw: ImageDraw.ImageDraw, name: str) -> int:
+    """The loop combine_with_background used before fit_font_size."""
+    font_size = BASE_SIZE
+    while font_size > MIN_SIZE:
+        font = get_font(font_size)
+        text_bbox = draw.textbbox((0, 0), name, font=font)
+        if text_bbox[2] - text_bbox[0] <= TILE_WIDTH - 20:
+            break
+        font_size -= 1
+    return font_size
+
+
+def per_tile_ms(fn, labels: list[str]) -> tuple[float, list[int]]:
+    started = time.perf_counter()
+    sizes = [fn(label) for label in labels]
+    return (time.perf_counter() - started) * 1000 / len(labels), sizes
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with open(os.path.join(ROOT, "skins.txt"), encoding="utf-8") as f:
+        labels = [line.strip().replace("_", " ").upper() for line in f if line.strip()][:count]
+    for size in range(MIN_SIZE, BASE_SIZE + 1):
+        get_font(size)
+    draw = ImageDraw.Draw(Image.new("RGBA", (TILE_WIDTH, TILE_WIDTH)))
+
+    def new_fit(name: str) -> int:
+        return fit_font_size((name,), TILE_WIDTH - 20, BASE_SIZE, MIN_SIZE)
+
+    old, old_sizes = per_tile_ms(lambda name: old_fit(draw, name), labels)
+    fit_font_size.cache_clear()
+    measure_text.cache_clear()
+    cold, new_sizes = per_tile_ms(new_fit, labels)
+    warm, _ = per_tile_ms(new_fit, labels)
+
+    shrunk = sum(size < BASE_SIZE for size in old_sizes)
+    print(f"{len(labels)} labels ({shrunk} shrunk below {BASE_SIZE}pt), per tile:")
+    print(f"  shrink loop + textbbox   {old:7.3f} ms")
+    print(f"  fit_font_size, cold      {cold:7.3f} ms ({old / cold:5.1f}x)")
+    print(f"  fit_font_size, warm      {warm * 1000:7.3f} us (memo hit)")
+    print(f"  same sizes: {old_sizes == new_sizes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Count connections opened with a session per command against the shared HTTP client.
+
+Usage: python benchmarks/bench_http_reuse.py [commands] [requests per command]
+
+A local aiohttp.web stub stands in for Epic and fortnite-api and counts
+the TCP connections it accepts. Each simulated command (a button click)
+makes a few requests, like a profile fetch or a gallery render. Before
+the shared client every command opened its own ClientSession, so each
+one paid a fresh connect; with HTTP the warm keep-alive pool serves
+them all. The stub is plain HTTP, so the timings leave out the TLS
+handshake that every new connection to the real APIs also pays.
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+from aiohttp import web
+
+from src.http_client import HttpClient
+
+CONCURRENCY = 10
+
+
+async def start_stub() -> tuple[web.AppRunner, str, set]:
+    # One RequestHandler per accepted connection; kept alive so ids stay unique.
+    connections = set()
+
+    async def handler(request):
+        connections.add(request.protocol)
+        return web.json_response({"status": 200, "data": {}})
+
+    app = web.Application()
+    app.router.add_get("/api", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/api", connections
+
+
+async def command(session: aiohttp.ClientSession, url: str, requests: int) -> None:
+    for _ in range(requests):
+        async with session.get(url) as resp:
+            await resp.read()
+
+
+async def run(mode: str, url: str, commands: int, requests: int) -> float:
+    slots = asyncio.Semaphore(CONCURRENCY)
+    http = HttpClient()
+    if mode == "shared":
+        await http.start()
+
+    async def one():
+        async with slots:
+            if mode == "shared":
+                await command(http.session, url, requests)
+            else:
+                async with aiohttp.ClientSession() as session:
+                    await command(session, url, requests)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(commands)])
+    elapsed = (time.perf_counter() - started) * 1000
+    await http.close()
+    return elapsed
+
+
+async def main() -> None:
+    commands = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    runner, url, connections = await start_stub()
+    try:
+        for mode in ("per-command", "shared"):
+            before = len(connections)
+            elapsed = await run(mode, url, commands, requests)
+            print(
+                f"{mode:11s} {commands} commands x {requests} requests: "
+                f"{len(connections) - before:4d} connections, {elapsed:7.1f} ms"
+            )
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+"""Time one tile icon from the PNG cache against the pre-scaled RGBA store.
+
+Usage: python benchmarks/bench_icon_store.py [icon.png ...]
+
+Without arguments a 1024x1024 RGBA icon (the size fortnite-api serves) is
+generated. Each icon is scaled to every ICON_STORE_SIZES entry, the way
+_process_cosmetic_item needs it, first by decoding and resizing the PNG and
+then through load_icon with a warm store. The two results are compared
+pixel for pixel.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import src.icon_store as icon_store
+from src.config import ICON_STORE_SIZES
+
+ROUNDS = 20
+
+
+def sample_icon(directory: str) -> str:
+    path = os.path.join(directory, "cid_bench_icon.png")
+    img = Image.radial_gradient("L").resize((1024, 1024))
+    Image.merge("RGBA", (img, img.rotate(90), img.rotate(180), img)).save(path)
+    return path
+
+
+def per_call_ms(fn, rounds: int = ROUNDS) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) * 1000 / rounds
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        icon_store.ICON_STORE_DIR = os.path.join(tmp, "icons")
+        icons = sys.argv[1:] or [sample_icon(tmp)]
+        for path in icons:
+            for size in ICON_STORE_SIZES:
+                def decode():
+                    with Image.open(path) as img:
+                        return img.convert("RGBA").resize((size, size), Image.Resampling.LANCZOS)
+
+                icon_store.load_icon(path, size)  # warm the store
+                cold = per_call_ms(decode)
+                warm = per_call_ms(lambda: icon_store.load_icon(path, size).copy())
+                same = decode().tobytes() == icon_store.load_icon(path, size).tobytes()
+                print(
+                    f"{os.path.basename(path)} @ {size}px: decode+resize {cold:6.2f} ms, "
+                    f"store {warm:5.2f} ms ({cold / warm:5.1f}x), identical={same}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Time sorting a 5,000-item locker: catalog infos per item against the sort-key index.
+
+Usage: python benchmarks/bench_sort.py [items]
+
+A temporary catalog is filled with skins.txt ids at seeded random
+rarities, and a locker of that many of them plus 51 banners is sorted
+both ways. The previous path resolved a full info dict per item and
+derived the key from it; sort_ids_by_rarity looks the precomputed key up
+in the catalog index. Both orders are printed as equal or not (the index
+path also breaks ties by id, so only the keys are compared).
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import src.fortnite_api as fortnite_api
+from src.catalog import CosmeticCatalog
+from src.config import ITEM_ORDER, RARITY_PRIORITY, SUB_ORDER, get_cosmetic_type
+
+ROUNDS = 10
+RARITIES = ["Common", "Uncommon", "Rare", "Epic", "Legendary", "Icon Series", "MARVEL SERIES"]
+
+
+async def previous_sort(ids: list[str], item_order: list[str] = ITEM_ORDER) -> list[str]:
+    """sort_ids_by_rarity before the sort-key index."""
+    info_list = await fortnite_api.get_cosmetic_infos(ids, None)
+
+    def get_sort_key(info: dict):
+        cid = info.get("id", "")
+        ctype = get_cosmetic_type(cid)
+        return (
+            item_order.index(ctype) if ctype in item_order else len(item_order),
+            RARITY_PRIORITY.get(info.get("rarity", "Common"), 999),
+            SUB_ORDER.get(cid.lower(), 9999),
+        )
+
+    return [info["id"] for info in sorted(info_list, key=get_sort_key)]
+
+
+async def per_call_ms(fn, rounds: int = ROUNDS) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await fn()
+    return (time.perf_counter() - started) * 1000 / rounds
+
+
+async def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 4950
+    with open(os.path.join(ROOT, "skins.txt"), encoding="utf-8") as f:
+        skin_ids = [line.strip().lower() for line in f if line.strip()]
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = CosmeticCatalog(os.path.join(tmp, "catalog.sqlite3"))
+        catalog.upsert_many([(cid, cid, rng.choice(RARITIES), "", None) for cid in skin_ids])
+        catalog.replace_banners([(f"banner_brs{n:02d}", f"Banner {n}", None) for n in range(51)])
+        fortnite_api.CATALOG = catalog
+
+        ids = rng.sample(skin_ids, min(count, len(skin_ids))) + [f"banner_brs{n:02d}" for n in range(51)]
+        rng.shuffle(ids)
+        previous = await per_call_ms(lambda: previous_sort(ids))
+        indexed = await per_call_ms(lambda: fortnite_api.sort_ids_by_rarity(ids, None))
+
+        keys = await fortnite_api.sort_ids_by_rarity(ids, None)
+        old = await previous_sort(ids)
+        sort_keys = catalog.sort_keys(ids)
+        same = [sort_keys.get(c.lower()) for c in keys] == [sort_keys.get(c.lower()) for c in old]
+        print(f"{len(ids)} items against a {len(catalog)}-row catalog:")
+        print(f"  infos + per-item key  {previous:6.1f} ms")
+        print(f"  sort-key index        {indexed:6.1f} ms ({previous / indexed:4.1f}x)")
+        print(f"  same key order: {same}")
+        catalog.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,18 +1,18 @@
+import io
 import os
+import uuid
+import shutil
 import asyncio
 import discord
-import aiohttp
 from datetime import datetime
 from discord.ext import commands
 from dotenv import load_dotenv
-from src.epic_auth import EpicGenerator, EpicUser
+from src.epic_auth import DEVICE_LOGINS, DeviceCode, EpicGenerator, EpicUser
 
 from src.fortnite_api import (
-    get_account_info,
-    get_vbucks_info,
-    get_profile_info,
-    get_account_stats,
-    grab_profile,
+    fetch_profile_snapshot,
+    fetch_locker_changes,
+    locker_items_from_state,
     download_and_prepare_banners,
     sort_ids_by_rarity,
 )
@@ -20,10 +20,16 @@ from src.config import (
     mask_account_id,
     bool_to_emoji,
     country_to_flag,
-    ID_PATTERN,
-    get_cosmetic_type,
 )
-from src.image_utils import create_checker_image
+from src.image_utils import create_checker_image, start_render_pool, RenderedImage
+from src.render_pool import RENDER_POOL
+from src.catalog import CATALOG
+from src.http_client import HTTP
+from src.token_manager import TOKENS
+from src.config import CATALOG_REFRESH_SECONDS, ITEM_ORDER, RENDER_SPILL_TO_DISK, TILE_CACHE_PRUNE_SECONDS
+from src.tile_cache import prune_tiles
+from src.session_store import create_session_store
+from src.prerender import PrerenderScheduler, CATEGORY_PRIORITY
 
 load_dotenv()
 
@@ -35,9 +41,74 @@ BOT_NAME = os.getenv("BOT_NAME", "Fortnite Checker")
 intents = discord.Intents.default()
 intents.message_content = True
 
-bot = commands.Bot(command_prefix='!', intents=intents)
+async def catalog_refresh_loop():
+    while True:
+        try:
+            await CATALOG.refresh(HTTP.session)
+        except Exception as e:
+            print(f"Error refreshing cosmetic catalog: {e}")
+        try:
+            await CATALOG.refresh_banners(HTTP.session)
+        except Exception as e:
+            print(f"Error refreshing banner catalog: {e}")
+        await asyncio.sleep(CATALOG_REFRESH_SECONDS)
+
+
+async def session_sweep_loop():
+    while True:
+        await asyncio.sleep(60)
+        expired = await SESSIONS.sweep()
+        if expired:
+            print(f"[DEBUG] Expired {expired} idle sessions. Store stats: {SESSIONS.stats}")
+
+
+async def tile_cache_prune_loop():
+    while True:
+        try:
+            removed = await asyncio.to_thread(prune_tiles)
+            if removed:
+                print(f"[DEBUG] Pruned {removed} tiles from the disk tile cache.")
+        except Exception as e:
+            print(f"Error pruning tile cache: {e}")
+        await asyncio.sleep(TILE_CACHE_PRUNE_SECONDS)
 
-USER_CACHE = {}
+
+class CheckerBot(commands.Bot):
+    async def setup_hook(self):
+        await HTTP.start()
+        start_render_pool()
+        CATALOG.open()
+        self.loop.create_task(catalog_refresh_loop())
+        self.loop.create_task(session_sweep_loop())
+        self.loop.create_task(tile_cache_prune_loop())
+        PRERENDER.start()
+
+    async def close(self):
+        await super().close()
+        await PRERENDER.stop()
+        await DEVICE_LOGINS.stop()
+        await TOKENS.stop()
+        await HTTP.close()
+        await SESSIONS.close()
+        RENDER_POOL.shutdown()
+        CATALOG.close()
+
+
+bot = CheckerBot(command_prefix='!', intents=intents)
+
+def cleanup_session(user_id: int, data: dict):
+    PRERENDER.cancel(user_id)
+    epic_user = data.get("epic_user")
+    if epic_user is not None:
+        TOKENS.forget(epic_user.account_id)
+    output_dir = session_output_dir(data)
+    if os.path.isdir(output_dir):
+        try:
+            shutil.rmtree(output_dir)
+        except Exception as e:
+            print(f"Error deleting {output_dir}: {e}")
+
+SESSIONS = create_session_store(on_evict=cleanup_session)
 
 BTN_INFO = "btn_account_info"
 BTN_SKINS = "btn_skins"
@@ -48,6 +119,9 @@ BTN_EMOTES = "btn_emotes"
 BTN_BANNERS = "btn_banners"
 BTN_ALL = "btn_all_cosmetics"
 BTN_EXIT = "btn_exit_session"
+BTN_REFRESH = "btn_refresh_locker"
+BTN_PREV_PAGE = "btn_prev_page"
+BTN_NEXT_PAGE = "btn_next_page"
 
 CATEGORY_MAP = {
     BTN_SKINS: "Skins",
@@ -86,7 +160,8 @@ class MainMenu(discord.ui.LayoutView):
             ),
     )
 
-def create_panel_view(username: str, content_type: str, text_content: str = None, image_filename: str = None):    
+def create_panel_view(username: str, content_type: str, text_content: str = None, image_filename: str = None,
+                      page: int = 0, page_count: int = 1):    
     is_info = content_type == "info"
     
     if is_info:
@@ -107,6 +182,8 @@ def create_panel_view(username: str, content_type: str, text_content: str = None
                 ),
             )
         ]
+        if page_count > 1:
+            container_items.append(discord.ui.TextDisplay(content=f"-# Page {page + 1} of {page_count}"))
 
     class PanelView(discord.ui.LayoutView):
         container1 = discord.ui.Container(*container_items, accent_colour=EMBED_COLOR)
@@ -123,151 +200,235 @@ def create_panel_view(username: str, content_type: str, text_content: str = None
             discord.ui.Button(style=discord.ButtonStyle.secondary, label="Emotes", disabled=(content_type == "Emotes"), custom_id=BTN_EMOTES),
             discord.ui.Button(style=discord.ButtonStyle.secondary, label="Banners", disabled=(content_type == "Banners"), custom_id=BTN_BANNERS),
             discord.ui.Button(style=discord.ButtonStyle.secondary, label="All cosmetics", disabled=(content_type == "All Cosmetics"), custom_id=BTN_ALL),
+            discord.ui.Button(style=discord.ButtonStyle.primary, label="Refresh", custom_id=BTN_REFRESH),
             discord.ui.Button(style=discord.ButtonStyle.danger, label="Exit", custom_id=BTN_EXIT),
         )
+
+        if page_count > 1:
+            action_row3 = discord.ui.ActionRow(
+                discord.ui.Button(style=discord.ButtonStyle.secondary, label="Previous page", disabled=(page <= 0), custom_id=BTN_PREV_PAGE),
+                discord.ui.Button(style=discord.ButtonStyle.secondary, label="Next page", disabled=(page >= page_count - 1), custom_id=BTN_NEXT_PAGE),
+            )
     
     return PanelView()
 
 async def fetch_user_data(user: EpicUser):
     print(f"[DEBUG] Fetching user data for {user.display_name}...")
-    async with aiohttp.ClientSession() as session:
-        account_info = await get_account_info(session, user)
-        if "error" in account_info:
-            print(f"[DEBUG] Error fetching account info: {account_info['error']}")
-            return None, account_info["error"]
-
-        print("[DEBUG] Account info fetched.")
-        vbucks_info = await get_vbucks_info(session, user)
-        stats = await get_account_stats(session, user)
+    session = HTTP.session
+    snapshot = await fetch_profile_snapshot(session, user)
+    if snapshot.error:
+        print(f"[DEBUG] Error fetching profile snapshot: {snapshot.error}")
+        return None, snapshot.error
+
+    print("[DEBUG] Profile snapshot fetched.")
+    account_info = snapshot.account
+    vbucks_info = snapshot.vbucks
+    stats = snapshot.stats
+    creation_date = snapshot.creation_date
         
-        profile_info = await get_profile_info(session, user)
-        creation_date = profile_info.get("creation_date", account_info.get("creation_date", "Unknown"))
+    ext_auths = snapshot.external_auths
+    psn_txt = "N/A"
+    xbox_txt = "N/A"
         
-        ext_auths = account_info.get("externalAuths", [])
-        psn_txt = "N/A"
-        xbox_txt = "N/A"
+    for auth in ext_auths:
+        atype = auth.get("type", "").lower()
+        name = auth.get("externalDisplayName", "Unknown")
+        date = auth.get("dateAdded", "Unknown")
+        if date != "Unknown":
+            try:
+                dt = datetime.strptime(date, "%Y-%m-%dT%H:%M:%S.%fZ")
+                date = dt.strftime("%d/%m/%Y")
+            except: pass
         
-        for auth in ext_auths:
-            atype = auth.get("type", "").lower()
-            name = auth.get("externalDisplayName", "Unknown")
-            date = auth.get("dateAdded", "Unknown")
-            if date != "Unknown":
-                try:
-                    dt = datetime.strptime(date, "%Y-%m-%dT%H:%M:%S.%fZ")
-                    date = dt.strftime("%d/%m/%Y")
-                except: pass
-            
-            if atype == "psn":
-                psn_txt = f"{name} ({date})"
-            elif atype == "xbl":
-                xbox_txt = f"{name} ({date})"
-
-        info_str = (
-            f"- <:id:1446748683415715892> **Account ID**: {mask_account_id(user.account_id)}\n"
-            f"- <:mail:1446748626867982376> **Email**: {account_info.get('email', 'Unknown')}\n"
-            f"- <:emoji:1446751218553720962> **Username**: {user.display_name}\n"
-            f"- <:popout:1446751906465710090> **Verified email**: {bool_to_emoji(account_info.get('emailVerified', False))}\n"
-            f"- <:private:1446748531674185803> **2FA**: {bool_to_emoji(account_info.get('tfaEnabled', False))}\n"
-            f"- <:parental_control:1446748409120821258> **Parental control**: {bool_to_emoji(account_info.get('minorVerified', False))}\n"
-            f"- <:member:1446748467434360862> **Name**: {account_info.get('name', 'Unknown')}\n"
-            f"- <:location:1446748563903221811> **Country**: {account_info.get('country', 'Unknown')} {country_to_flag(account_info.get('country', ''))}\n"
-            f"- <:shop:1446750337125056582> **V-Bucks**: {vbucks_info.get('totalAmount', 0)}\n"
-            f"- <:date:1446748494470709429> **Creation date**: {creation_date}\n"
-            f"- <:game:1446748596895613070> **Playstation**: {psn_txt}\n"
-            f"- <:game:1446748596895613070> **Xbox**: {xbox_txt}\n"
-            f"- <:help:1446751192414945280> **Account level**: {stats.get('account_level', 0)}\n"
-            f"- <:trophy:1446748325851300002> **Total Wins**: {stats.get('total_wins', 0)}\n"
-            f"- <:time:1446748659407654942> **Last match played**: {stats.get('last_played_info', 'N/A')}"
-        )
+        if atype == "psn":
+            psn_txt = f"{name} ({date})"
+        elif atype == "xbl":
+            xbox_txt = f"{name} ({date})"
 
-        athena_profile = await grab_profile(session, {"account_id": user.account_id, "access_token": user.access_token}, "athena")
-        if isinstance(athena_profile, str):
-            print(f"[DEBUG] Error fetching athena profile: {athena_profile}")
-            return None, "Error fetching profile"
-
-        print("[DEBUG] Athena profile fetched. Parsing items...")
-        items = {}
-        for item_data in athena_profile["profileChanges"][0]["profile"]["items"].values():
-            tid = item_data.get("templateId", "").lower()
-            if "loadingscreen_character_lineup" in tid:
-                continue
-            if ID_PATTERN.match(tid):
-                cosmetic_id = tid.split(":")[1]
-                ctype = get_cosmetic_type(tid)
-                items.setdefault(ctype, []).append(cosmetic_id)
-
-        banner_ids = await download_and_prepare_banners(session, user)
-        if banner_ids:
-            items.setdefault("Banners", []).extend(banner_ids)
-            
-        print(f"[DEBUG] Data fetch complete. Found {sum(len(v) for v in items.values())} items.")
-        return {
-            "info_str": info_str,
-            "items": items,
-            "username": user.display_name,
-            "epic_user": user,
-            "image_paths": {} 
-        }, None
-
-async def pre_generate_category(user_id: int, category: str):
-    if user_id not in USER_CACHE:
-        return
-    
-    data = USER_CACHE[user_id]
-    if category in data["image_paths"]:
-        return
+    info_str = (
+        f"- <:id:1446748683415715892> **Account ID**: {mask_account_id(user.account_id)}\n"
+        f"- <:mail:1446748626867982376> **Email**: {account_info.get('email', 'Unknown')}\n"
+        f"- <:emoji:1446751218553720962> **Username**: {user.display_name}\n"
+        f"- <:popout:1446751906465710090> **Verified email**: {bool_to_emoji(account_info.get('emailVerified', False))}\n"
+        f"- <:private:1446748531674185803> **2FA**: {bool_to_emoji(account_info.get('tfaEnabled', False))}\n"
+        f"- <:parental_control:1446748409120821258> **Parental control**: {bool_to_emoji(account_info.get('minorVerified', False))}\n"
+        f"- <:member:1446748467434360862> **Name**: {account_info.get('name', 'Unknown')}\n"
+        f"- <:location:1446748563903221811> **Country**: {account_info.get('country', 'Unknown')} {country_to_flag(account_info.get('country', ''))}\n"
+        f"- <:shop:1446750337125056582> **V-Bucks**: {vbucks_info.get('totalAmount', 0)}\n"
+        f"- <:date:1446748494470709429> **Creation date**: {creation_date}\n"
+        f"- <:game:1446748596895613070> **Playstation**: {psn_txt}\n"
+        f"- <:game:1446748596895613070> **Xbox**: {xbox_txt}\n"
+        f"- <:help:1446751192414945280> **Account level**: {stats.get('account_level', 0)}\n"
+        f"- <:trophy:1446748325851300002> **Total Wins**: {stats.get('total_wins', 0)}\n"
+        f"- <:time:1446748659407654942> **Last match played**: {stats.get('last_played_info', 'N/A')}"
+    )
+
+    print("[DEBUG] Parsing items...")
+    items = snapshot.locker_items
 
-    ids_to_show = []
+    banner_ids = await download_and_prepare_banners(session, snapshot.banner_ids)
+    if banner_ids:
+        items.setdefault("Banners", []).extend(banner_ids)
+        
+    print(f"[DEBUG] Data fetch complete. Found {sum(len(v) for v in items.values())} items.")
+    return {
+        "info_str": info_str,
+        "items": items,
+        "username": user.display_name,
+        "epic_user": user,
+        "session_id": uuid.uuid4().hex,
+        "sorted_ids": {},
+        "current": None,
+        "locker": snapshot.locker_state,
+        # Bumped by every refresh that changes the locker, so renders of the
+        # old locker that finish afterwards are not stored.
+        "version": 0,
+    }, None
+
+def collect_category_ids(data: dict, category: str) -> list[str]:
     if category == "All Cosmetics":
-        order = ["Skins", "Back Blings", "Pickaxes", "Emotes", "Gliders", "Banners"]
-        for grp in order:
+        ids_to_show = []
+        for grp in ITEM_ORDER:
             ids_to_show.extend(data["items"].get(grp, []))
-    else:
-        ids_to_show = data["items"].get(category, [])
-    
+        return ids_to_show
+    return data["items"].get(category, [])
+
+async def render_category(user_id: int, data: dict, category: str, page: int = 0) -> RenderedImage | None:
+    cached = await SESSIONS.get_image(user_id, category, page)
+    if cached is not None:
+        return cached
+
+    version = data["version"]
+    ids_to_show = collect_category_ids(data, category)
     if not ids_to_show:
+        return None
+
+    session = HTTP.session
+    sorted_ids = data["sorted_ids"].get(category)
+    if sorted_ids is None:
+        sorted_ids = await sort_ids_by_rarity(ids_to_show, session, item_order=ITEM_ORDER)
+        data["sorted_ids"][category] = sorted_ids
+
+    image = await create_checker_image(
+        sorted_ids,
+        session,
+        username=data["username"],
+        group_name=category,
+        output_dir=session_output_dir(data) if RENDER_SPILL_TO_DISK else None,
+        footer_text=category,
+        page=page,
+    )
+    if image:
+        await SESSIONS.put_image(user_id, category, page, image, version)
+    return image
+
+async def refresh_locker(user_id: int, data: dict) -> set[str] | str:
+    """Apply the profile changes since the last fetch; return the stale categories."""
+    changed = await fetch_locker_changes(HTTP.session, data["epic_user"], data["locker"])
+    if isinstance(changed, int):
+        return f"Error refreshing locker ({changed})"
+    if not changed:
+        # Nothing owned changed, but later refreshes can start from the new revision.
+        await SESSIONS.update(user_id, {"locker": data["locker"]})
+        return changed
+
+    items = locker_items_from_state(data["locker"])
+    banners = data["items"].get("Banners", [])
+    if banners:
+        items["Banners"] = list(banners)
+    data["items"] = items
+
+    if changed & set(ITEM_ORDER):
+        changed.add("All Cosmetics")
+    for category in changed:
+        data["sorted_ids"].pop(category, None)
+    if data["current"] and data["current"][0] in changed:
+        data["current"] = None
+    data["version"] += 1
+    await SESSIONS.update(
+        user_id,
+        {key: data[key] for key in ("items", "locker", "current", "version")},
+        stale_categories=changed,
+    )
+    print(f"[DEBUG] Locker refreshed at revision {data['locker']['rvn']}: {sorted(changed)} changed.")
+    return changed
+
+def session_output_dir(data: dict) -> str:
+    return os.path.join("output", data["session_id"])
+
+def gallery_view(data: dict, category: str, image: RenderedImage):
+    file = discord.File(io.BytesIO(image.data), filename=image.filename)
+    view = create_panel_view(data["username"], category, image_filename=image.filename,
+                             page=image.page, page_count=image.page_count)
+    return view, file
+
+async def show_gallery(interaction: discord.Interaction, data: dict, category: str, page: int = 0):
+    user_id = interaction.user.id
+    cached = await SESSIONS.get_image(user_id, category, page)
+    if cached:
+        view, file = gallery_view(data, category, cached)
+        await interaction.response.edit_message(view=view, attachments=[file])
+        await SESSIONS.update(user_id, {"current": (category, page)})
         return
 
-    try:
-        async with aiohttp.ClientSession() as session:
-            order = ["Skins", "Back Blings", "Pickaxes", "Emotes", "Gliders", "Banners"]
-            sorted_ids = await sort_ids_by_rarity(ids_to_show, session, item_order=order)
-            
-            output_dir = "output"
-            path = await create_checker_image(
-                sorted_ids,
-                session,
-                username=data["username"],
-                group_name=category,
-                output_dir=output_dir,
-                footer_text=category
-            )
-            if path:
-                data["image_paths"][category] = path
-                print(f"[DEBUG] Pre-generated {category} image at {path}")
-    except Exception as e:
-        print(f"Failed to generate {category}: {e}")
+    if not collect_category_ids(data, category):
+        await interaction.response.send_message(f"No items found for {category}.", ephemeral=True)
+        return
+
+    await interaction.response.defer()
+    image = await PRERENDER.run(
+        user_id, category, page,
+        lambda: render_category(user_id, data, category, page),
+    )
+    if image:
+        view, file = gallery_view(data, category, image)
+        await interaction.edit_original_response(view=view, attachments=[file])
+        await SESSIONS.update(user_id, {"current": (category, page)})
+    else:
+        await interaction.followup.send("Failed to generate image.", ephemeral=True)
+
+async def prerender_category(user_id: int, category: str) -> RenderedImage | None:
+    data = await SESSIONS.get(user_id)
+    if data is None:
+        return None
 
-async def wait_for_login(interaction: discord.Interaction, generator: EpicGenerator, device_code: str, message: discord.WebhookMessage):
+    image = await render_category(user_id, data, category)
+    if image:
+        print(f"[DEBUG] Pre-generated {category} image ({image.size_bytes} bytes)")
+    return image
+
+PRERENDER = PrerenderScheduler(prerender_category)
+
+async def wait_for_login(interaction: discord.Interaction, generator: EpicGenerator, device: DeviceCode, message: discord.WebhookMessage):
     try:
-        print(f"[DEBUG] Waiting for device code completion: {device_code}")
-        user = await generator.wait_for_device_code_completion(device_code)
+        print(f"[DEBUG] Waiting for device code completion: {device.device_code}")
+        user = await generator.wait_for_device_code_completion(device)
         print(f"[DEBUG] User logged in: {user.display_name} ({user.account_id})")
+        user_id = interaction.user.id
+        TOKENS.track(
+            user,
+            HTTP.session,
+            on_refresh=lambda refreshed: SESSIONS.update(user_id, {"epic_user": refreshed}),
+        )
         
         data, error = await fetch_user_data(user)
         if error:
             print(f"[DEBUG] Error in fetch_user_data: {error}")
+            TOKENS.forget(user.account_id)
             await interaction.followup.send(f"❌ {error}", ephemeral=True)
             return
 
         print("[DEBUG] Storing user data in cache and updating view.")
-        USER_CACHE[interaction.user.id] = data
+        await SESSIONS.set(interaction.user.id, data)
         
         view = create_panel_view(user.display_name, "info", text_content=data["info_str"])
         await message.edit(view=view)
         print("[DEBUG] View updated.")
 
-        asyncio.create_task(pre_generate_category(interaction.user.id, "Skins"))
+        PRERENDER.schedule(
+            interaction.user.id,
+            [category for category in CATEGORY_PRIORITY if collect_category_ids(data, category)],
+        )
         
     except Exception as e:
         print(f"[DEBUG] Exception in wait_for_login: {e}")
@@ -299,11 +460,11 @@ async def on_interaction(interaction: discord.Interaction):
         if custom_id == "fd57fbb23dcc4db1ffa4e3db7580d965":
             print("[DEBUG] Starting login flow...")
             await interaction.response.defer(ephemeral=True)
-            generator = EpicGenerator()
+            generator = EpicGenerator(HTTP.session)
             await generator.start()
             try:
-                verification_url, device_code = await generator.create_device_code()
-                print(f"[DEBUG] Device code created: {device_code}")
+                device = await generator.create_device_code()
+                print(f"[DEBUG] Device code created: {device.device_code} ({len(DEVICE_LOGINS)} logins pending)")
                 
                 class VerificationMenu(discord.ui.LayoutView):
                     container1 = discord.ui.Container(
@@ -312,27 +473,20 @@ async def on_interaction(interaction: discord.Interaction):
                         accent_colour=EMBED_COLOR,
                     )
                     action_row1 = discord.ui.ActionRow(
-                        discord.ui.Button(url=verification_url, style=discord.ButtonStyle.link, label="Epic Game login"),
+                        discord.ui.Button(url=device.verification_url, style=discord.ButtonStyle.link, label="Epic Game login"),
                     )
 
                 view = VerificationMenu()
                 message = await interaction.followup.send(view=view, ephemeral=True)
-                asyncio.create_task(wait_for_login(interaction, generator, device_code, message))
+                asyncio.create_task(wait_for_login(interaction, generator, device, message))
             except Exception as e:
                 await interaction.followup.send(f"Error initializing login: {e}", ephemeral=True)
                 await generator.close()
 
         elif custom_id == BTN_EXIT:
-            if user_id in USER_CACHE:
-                data = USER_CACHE[user_id]
-                for path in data.get("image_paths", {}).values():
-                    try:
-                        if os.path.exists(path):
-                            os.remove(path)
-                    except Exception as e:
-                        print(f"Error deleting file {path}: {e}")
-                
-                del USER_CACHE[user_id]
+            data = await SESSIONS.pop(user_id)
+            if data is not None:
+                cleanup_session(user_id, data)
             
             class ExitView(discord.ui.LayoutView):    
                 container1 = discord.ui.Container(
@@ -352,64 +506,55 @@ async def on_interaction(interaction: discord.Interaction):
             await interaction.response.edit_message(view=ExitView(), attachments=[])
                 
         elif custom_id in [BTN_INFO, BTN_SKINS, BTN_PICKAXES, BTN_BACKBLINGS, BTN_GLIDERS, BTN_EMOTES, BTN_BANNERS, BTN_ALL]:
-            if user_id not in USER_CACHE:
+            data = await SESSIONS.get(user_id)
+            if data is None:
                 await interaction.response.send_message("❌ Session expired or data not found. Please login again.", ephemeral=True)
                 return
             
-            data = USER_CACHE[user_id]
             username = data["username"]
             
             if custom_id == BTN_INFO:
                 view = create_panel_view(username, "info", text_content=data["info_str"])
                 await interaction.response.edit_message(view=view, attachments=[])
             else:
-                category = CATEGORY_MAP[custom_id]
-                
-                if category in data["image_paths"]:
-                    path = data["image_paths"][category]
-                    filename = os.path.basename(path)
-                    file = discord.File(path, filename=filename)
-                    view = create_panel_view(username, category, image_filename=filename)
-                    await interaction.response.edit_message(view=view, attachments=[file])
-                    return
-
-                await interaction.response.defer()
-                
-                ids_to_show = []
-                if category == "All Cosmetics":
-                    order = ["Skins", "Back Blings", "Pickaxes", "Emotes", "Gliders", "Banners"]
-                    for grp in order:
-                        ids_to_show.extend(data["items"].get(grp, []))
-                else:
-                    ids_to_show = data["items"].get(category, [])
-                
-                if not ids_to_show:
-                    await interaction.followup.send(f"No items found for {category}.", ephemeral=True)
-                    return
-
-                async with aiohttp.ClientSession() as session:
-                    order = ["Skins", "Back Blings", "Pickaxes", "Emotes", "Gliders", "Banners"]
-                    sorted_ids = await sort_ids_by_rarity(ids_to_show, session, item_order=order)
-                    
-                    output_dir = "output"
-                    path = await create_checker_image(
-                        sorted_ids,
-                        session,
-                        username=username,
-                        group_name=category,
-                        output_dir=output_dir,
-                        footer_text=category
-                    )
-                
-                if path:
-                    data["image_paths"][category] = path
-                    
-                    filename = os.path.basename(path)
-                    file = discord.File(path, filename=filename)
-                    view = create_panel_view(username, category, image_filename=filename)
-                    await interaction.edit_original_response(view=view, attachments=[file])
-                else:
-                    await interaction.followup.send("Failed to generate image.", ephemeral=True)
+                await show_gallery(interaction, data, CATEGORY_MAP[custom_id])
+
+        elif custom_id == BTN_REFRESH:
+            data = await SESSIONS.get(user_id)
+            if data is None or not data.get("locker"):
+                await interaction.response.send_message("❌ Session expired or data not found. Please login again.", ephemeral=True)
+                return
+
+            await interaction.response.defer()
+            changed = await refresh_locker(user_id, data)
+            if isinstance(changed, str):
+                await interaction.followup.send(f"❌ {changed}", ephemeral=True)
+                return
+
+            if not changed:
+                await interaction.followup.send("Your locker is already up to date.", ephemeral=True)
+                return
+
+            # Only once the refresh went through: the queue is rebuilt for the new
+            # locker. Unchanged categories that already rendered are cache hits;
+            # renders still running finish and the version check keeps their
+            # stale images out of the store.
+            PRERENDER.drop_queued(user_id)
+            PRERENDER.schedule(
+                user_id,
+                [category for category in CATEGORY_PRIORITY if collect_category_ids(data, category)],
+            )
+            await interaction.followup.send(f"✅ Locker refreshed. Updated: {', '.join(sorted(changed))}.", ephemeral=True)
+
+        elif custom_id in [BTN_PREV_PAGE, BTN_NEXT_PAGE]:
+            data = await SESSIONS.get(user_id)
+            if data is None or not data["current"]:
+                await interaction.response.send_message("❌ Session expired or data not found. Please login again.", ephemeral=True)
+                return
+
+            category, page = data["current"]
+            page += 1 if custom_id == BTN_NEXT_PAGE else -1
+            await show_gallery(interaction, data, category, max(page, 0))
 
 if __name__ == "__main__":
     bot.run(TOKEN)
\ No newline at end of file
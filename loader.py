@@ -1,49 +1,183 @@
 import aiohttp
+import argparse
 import asyncio
 import os
+import shutil
+import time
 
-if not os.path.exists("cache"):
-    os.makedirs("cache")
+from src.catalog import CATALOG
+from src.config import CACHE_DIR, GALLERY_PAGE_SIZE, is_placeholder_copy
+from src.image_cache import IMAGE_CACHE
+from src.render_pool import RENDER_POOL
+from src.tile_cache import prune_tiles
+
+# Where older versions of this script wrote icons; the bot never read it.
+LEGACY_CACHE_DIR = "cache"
 
 def read_skin_ids(file_path):
+    # The bot looks every id up in lower case; warm the caches under the same keys.
     with open(file_path, "r", encoding="utf-8") as file:
-        return [line.strip() for line in file if line.strip()]
+        return [line.strip().lower() for line in file if line.strip()]
 
-async def download_image(session, skin_id):
-    imgpath = f"./cache/{skin_id}.png"
+def migrate_legacy_cache():
+    if not os.path.isdir(LEGACY_CACHE_DIR):
+        return 0
+    if os.path.abspath(LEGACY_CACHE_DIR) == os.path.abspath(CACHE_DIR):
+        return 0
 
-    if os.path.exists(imgpath) and os.path.isfile(imgpath):
-        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    moved = 0
+    for name in os.listdir(LEGACY_CACHE_DIR):
+        src = os.path.join(LEGACY_CACHE_DIR, name)
+        dst = os.path.join(CACHE_DIR, name.lower())
+        if not name.endswith(".png") or os.path.exists(dst):
+            continue
+        with open(src, "rb") as f:
+            if is_placeholder_copy(f.read()):
+                # Stand-ins for failed downloads; the prefetch below retries them.
+                os.remove(src)
+                continue
+        # Moved files are verified and adopted by the manifest on first lookup.
+        shutil.move(src, dst)
+        moved += 1
+    return moved
+
+class Progress:
+    def __init__(self, total, label):
+        self.total = total
+        self.label = label
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self.last_report = 0.0
 
+    def update(self, ok):
+        self.done += 1
+        if not ok:
+            self.failed += 1
+        now = time.monotonic()
+        if now - self.last_report >= 2 or self.done == self.total:
+            self.last_report = now
+            elapsed = max(now - self.started, 1e-6)
+            print(
+                f"{self.label}: {self.done}/{self.total} "
+                f"({self.done / elapsed:.1f}/s, {self.failed} failed, {elapsed:.0f}s elapsed)"
+            )
+
+async def download_image(session, skin_id, retries):
     urls = [
         f"https://fortnite-api.com/images/cosmetics/br/{skin_id}/icon.png",
         f"https://fortnite-api.com/images/cosmetics/br/{skin_id}/smallicon.png"
     ]
 
-    for url in urls:
-        async with session.get(url) as resp:
-            if resp.status == 200:
-                with open(imgpath, "wb") as f:
-                    f.write(await resp.read())
-                print(f"Image loaded: {imgpath}")
-                return
+    try:
+        return await IMAGE_CACHE.fetch(session, skin_id, urls, retries=retries) is not None
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Could not download image for {skin_id}: {e}")
+        return False
+
+async def prefetch_images(session, skin_ids, concurrency, retries):
+    semaphore = asyncio.Semaphore(concurrency)
+    progress = Progress(len(skin_ids), "Icons")
+
+    async def worker(skin_id):
+        async with semaphore:
+            progress.update(await download_image(session, skin_id, retries))
+
+    await asyncio.gather(*[worker(sid) for sid in skin_ids])
+
+async def ingest_icons(skin_ids, batch_size=500):
+    from src.icon_store import ingest_icon
+    from src.image_utils import start_render_pool
+
+    paths = [IMAGE_CACHE.path_for(sid) for sid in skin_ids]
+    paths = [p for p in paths if os.path.exists(p)]
+    progress = Progress(len(paths), "Icon store")
+
+    start_render_pool()
+    for start in range(0, len(paths), batch_size):
+        for ok in await RENDER_POOL.map(ingest_icon, paths[start:start + batch_size]):
+            progress.update(ok)
+
+async def prerender_tiles(session, skin_ids, tile_sizes, batch_size=500):
+    from src.fortnite_api import get_cosmetic_infos
+    from src.image_utils import tile_args, render_tiles
 
-    placeholder_path = "src/placeholder.png"
-    
-    if not os.path.exists(placeholder_path):
-        raise FileNotFoundError("ERROR: src/placeholder.png not found!")
-    
-    with open(imgpath, "wb") as f:
-        f.write(open(placeholder_path, "rb").read())
+    infos = await get_cosmetic_infos(skin_ids, session)
+    valid = [c for c in infos if c["name"].strip().lower() != "unknown"]
 
-    print(f"Could not download image for {skin_id}, using placeholder.")
+    for tile_size in tile_sizes:
+        progress = Progress(len(valid), f"Tiles @ {tile_size}px")
+        for start in range(0, len(valid), batch_size):
+            batch = valid[start:start + batch_size]
+            await render_tiles([tile_args(c, tile_size) for c in batch])
+            for _ in batch:
+                progress.update(True)
+
+def gallery_tile_sizes():
+    """Every tile size a gallery page of up to GALLERY_PAGE_SIZE items is drawn at."""
+    from src.image_utils import grid_layout
+
+    return sorted({grid_layout(n)[2] for n in range(1, GALLERY_PAGE_SIZE + 1)}, reverse=True)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Warm up the cosmetic caches used by the bot.")
+    parser.add_argument("--ids-file", default="skins.txt",
+                        help="file with one cosmetic id per line (default: skins.txt)")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="maximum simultaneous downloads (default: 16)")
+    parser.add_argument("--retries", type=int, default=3,
+                        help="retries per URL on network errors, 429 and 5xx (default: 3)")
+    parser.add_argument("--icons", action="store_true",
+                        help="also pre-scale icons into the raw icon store")
+    parser.add_argument("--tiles", action="store_true",
+                        help="also pre-render gallery tiles into the tile cache")
+    parser.add_argument("--tile-size", type=int, action="append", dest="tile_sizes",
+                        help="tile size to pre-render, repeatable "
+                             f"(default: every size the bot uses, {', '.join(map(str, gallery_tile_sizes()))}px)")
+    parser.add_argument("--catalog", metavar="JSON",
+                        help="seed the cosmetic catalog from a local fortnite-api dump and exit")
+    parser.add_argument("--refresh-catalog", action="store_true",
+                        help="download the full cosmetic catalog before fetching images")
+    args = parser.parse_args()
+    if not args.tile_sizes:
+        args.tile_sizes = gallery_tile_sizes()
+    return args
 
 async def main():
-    skin_ids = read_skin_ids("skins.txt")
+    args = parse_args()
+
+    if args.catalog:
+        count = CATALOG.load_json_file(args.catalog)
+        print(f"Catalog seeded with {count} cosmetics from {args.catalog}.")
+        return
+
+    moved = migrate_legacy_cache()
+    if moved:
+        print(f"Moved {moved} icons from ./{LEGACY_CACHE_DIR} into {CACHE_DIR}.")
+
+    skin_ids = read_skin_ids(args.ids_file)
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        if args.refresh_catalog or (args.tiles and not len(CATALOG)):
+            await CATALOG.refresh(session, force=args.refresh_catalog)
+
+        # Already cached and recently failed ids resolve from the manifest
+        # without a request, so an interrupted run simply resumes.
+        await prefetch_images(session, skin_ids, args.concurrency, args.retries)
+
+        try:
+            if args.icons:
+                await ingest_icons(skin_ids)
 
-    async with aiohttp.ClientSession() as session:
-        tasks = [download_image(session, sid) for sid in skin_ids]
-        await asyncio.gather(*tasks)
+            if args.tiles:
+                await prerender_tiles(session, skin_ids, args.tile_sizes)
+                removed = prune_tiles()
+                if removed:
+                    print(f"Pruned {removed} tiles to stay under the tile cache size cap.")
+        finally:
+            RENDER_POOL.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
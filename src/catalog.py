@@ -0,0 +1,286 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import aiohttp
+
+from src.config import CATALOG_PATH, CATALOG_REFRESH_SECONDS, cosmetic_sort_key
+
+COSMETICS_URL = "https://fortnite-api.com/v2/cosmetics/br"
+BANNERS_URL = "https://fortnite-api.com/v1/banners"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cosmetics (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    rarity TEXT NOT NULL,
+    type TEXT NOT NULL,
+    series TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS banners (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    icon TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS misses (
+    id TEXT PRIMARY KEY,
+    checked_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# SQLite's default host parameter limit is 999 on older builds.
+_LOOKUP_CHUNK = 900
+
+
+def row_from_api(entry: dict) -> tuple:
+    """Flatten one fortnite-api cosmetic entry into a catalog row."""
+    return (
+        entry["id"].lower(),
+        entry.get("name") or "Unknown",
+        (entry.get("rarity") or {}).get("displayValue", "Common"),
+        (entry.get("type") or {}).get("value", ""),
+        (entry.get("series") or {}).get("value"),
+    )
+
+
+def banner_row_from_api(entry: dict) -> tuple:
+    """Flatten one fortnite-api banner entry into a banners row keyed like locker ids."""
+    cid = f"banner_{entry['id'].lower()}"
+    return (
+        cid,
+        entry.get("devName") or f"Banner {cid}",
+        (entry.get("images") or {}).get("icon"),
+    )
+
+
+class CosmeticCatalog:
+    """On-disk id -> name/rarity/type/series index for every BR cosmetic."""
+
+    def __init__(self, path: str = CATALOG_PATH) -> None:
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        # id -> cosmetic_sort_key, so sorting a locker is one dict hit per item.
+        self._sort_index: dict[str, tuple[int, int, int]] = {}
+        # banner_<id> -> (name, icon url); a few thousand rows, kept in memory.
+        self._banners: dict[str, tuple[str, str | None]] = {}
+
+    def open(self) -> None:
+        if self._conn is not None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        self._sort_index = {
+            cid: cosmetic_sort_key(cid, rarity)
+            for cid, rarity in conn.execute("SELECT id, rarity FROM cosmetics")
+        }
+        self._banners = {
+            cid: (name, icon) for cid, name, icon in conn.execute("SELECT id, name, icon FROM banners")
+        }
+        self._conn = conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self) -> int:
+        self.open()
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cosmetics").fetchone()[0]
+
+    def get(self, cosmetic_id: str) -> dict | None:
+        return self.get_many([cosmetic_id]).get(cosmetic_id.lower())
+
+    def get_many(self, ids: list[str]) -> dict[str, dict]:
+        """Look up many ids at once; the result is keyed by lower-cased id."""
+        self.open()
+        wanted = list({i.lower() for i in ids})
+        found = {}
+        with self._lock:
+            for start in range(0, len(wanted), _LOOKUP_CHUNK):
+                chunk = wanted[start:start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT id, name, rarity, type, series FROM cosmetics WHERE id IN ({placeholders})",
+                    chunk,
+                )
+                for cid, name, rarity, ctype, series in rows:
+                    found[cid] = {"name": name, "rarity": rarity, "type": ctype, "series": series}
+                    # Rows another process wrote since open() get indexed here.
+                    self._sort_index[cid] = cosmetic_sort_key(cid, rarity)
+        return found
+
+    def sort_keys(self, ids: list[str]) -> dict[str, tuple[int, int, int]]:
+        """Precomputed sort keys for the ids the catalog knows, by lower-cased id."""
+        self.open()
+        index = self._sort_index
+        return {cid: index[cid] for cid in (i.lower() for i in ids) if cid in index}
+
+    def upsert_many(self, rows: list[tuple]) -> None:
+        self.open()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cosmetics (id, name, rarity, type, series) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            for cid, _, rarity, _, _ in rows:
+                self._sort_index[cid] = cosmetic_sort_key(cid, rarity)
+            self._conn.executemany("DELETE FROM misses WHERE id = ?", [(row[0],) for row in rows])
+
+    def recent_misses(self, ids: list[str], max_age: float = CATALOG_REFRESH_SECONDS) -> set[str]:
+        """Lower-cased ids fortnite-api did not know when asked within ``max_age`` seconds."""
+        self.open()
+        wanted = list({i.lower() for i in ids})
+        cutoff = time.time() - max_age
+        found = set()
+        with self._lock:
+            for start in range(0, len(wanted), _LOOKUP_CHUNK):
+                chunk = wanted[start:start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT id FROM misses WHERE checked_at >= ? AND id IN ({placeholders})",
+                    [cutoff, *chunk],
+                )
+                found.update(cid for (cid,) in rows)
+        return found
+
+    def record_misses(self, ids: list[str]) -> None:
+        """Remember ids fortnite-api answered 404 for, so they are not asked again
+        until the next catalog refresh could have brought them in."""
+        self.open()
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO misses (id, checked_at) VALUES (?, ?)", [(i.lower(), now) for i in ids]
+            )
+
+    def banner_count(self) -> int:
+        self.open()
+        return len(self._banners)
+
+    def get_banners(self, ids: list[str]) -> dict[str, tuple[str, str | None]]:
+        """(name, icon url) for the banner ids the catalog knows, by lower-cased id."""
+        self.open()
+        index = self._banners
+        return {cid: index[cid] for cid in (i.lower() for i in ids) if cid in index}
+
+    def replace_banners(self, rows: list[tuple]) -> None:
+        """Swap in a full banners list; /v1/banners is small enough to replace wholesale."""
+        self.open()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM banners")
+            self._conn.executemany("INSERT OR REPLACE INTO banners (id, name, icon) VALUES (?, ?, ?)", rows)
+            self._banners = {cid: (name, icon) for cid, name, icon in rows}
+
+    def get_meta(self, key: str, default: str | None = None) -> str | None:
+        self.open()
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.open()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def load_dump(self, data: dict | list) -> int:
+        """Bulk-load a full cosmetics dump (``{"data": [...]}`` or a bare list)."""
+        entries = data.get("data", []) if isinstance(data, dict) else data
+        rows = [row_from_api(e) for e in entries if e.get("id")]
+        self.upsert_many(rows)
+        # A fresh dump is the authority on what exists; ask about the rest again.
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM misses")
+        return len(rows)
+
+    def load_json_file(self, path: str) -> int:
+        with open(path, "r", encoding="utf-8") as f:
+            return self.load_dump(json.load(f))
+
+    async def _conditional_get(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        meta_prefix: str,
+        force: bool,
+        max_age: float = CATALOG_REFRESH_SECONDS,
+    ) -> tuple[dict | None, dict]:
+        """GET ``url`` unless it was checked within ``max_age`` seconds or the server says 304.
+
+        Validators and the last check time live in meta under ``meta_prefix``.
+        Returns the decoded body (None when there is nothing new) and the meta
+        entries to store once that body has been loaded.
+        """
+        checked_at = float(self.get_meta(f"{meta_prefix}checked_at", "0"))
+        if not force and time.time() - checked_at < max_age:
+            return None, {}
+
+        headers = {}
+        etag = self.get_meta(f"{meta_prefix}etag")
+        last_modified = self.get_meta(f"{meta_prefix}last_modified")
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        async with session.get(url, headers=headers) as resp:
+            if resp.status == 304:
+                self.set_meta(f"{meta_prefix}checked_at", str(time.time()))
+                return None, {}
+            if resp.status != 200:
+                print(f"[DEBUG] Catalog refresh of {url} failed ({resp.status})")
+                return None, {}
+            data = await resp.json()
+            meta = {f"{meta_prefix}checked_at": str(time.time())}
+            if resp.headers.get("ETag"):
+                meta[f"{meta_prefix}etag"] = resp.headers["ETag"]
+            if resp.headers.get("Last-Modified"):
+                meta[f"{meta_prefix}last_modified"] = resp.headers["Last-Modified"]
+        return data, meta
+
+    async def refresh(self, session: aiohttp.ClientSession, force: bool = False) -> int:
+        """Re-download the full dump when the server copy changed.
+
+        Uses the stored ETag / Last-Modified for a conditional request and
+        skips the network entirely while the last check is younger than
+        CATALOG_REFRESH_SECONDS. Returns the number of rows written.
+        """
+        data, meta = await self._conditional_get(session, COSMETICS_URL, "", force or not len(self))
+        if data is None:
+            return 0
+
+        count = await asyncio.to_thread(self.load_dump, data)
+        for key, value in meta.items():
+            self.set_meta(key, value)
+        print(f"[DEBUG] Cosmetic catalog refreshed with {count} entries.")
+        return count
+
+    async def refresh_banners(
+        self, session: aiohttp.ClientSession, force: bool = False, max_age: float = CATALOG_REFRESH_SECONDS
+    ) -> int:
+        """Same as refresh() for the /v1/banners list. Returns the number of banners stored."""
+        data, meta = await self._conditional_get(
+            session, BANNERS_URL, "banners_", force or not self.banner_count(), max_age
+        )
+        if data is None:
+            return 0
+
+        rows = [banner_row_from_api(b) for b in data.get("data", []) if b.get("id")]
+        await asyncio.to_thread(self.replace_banners, rows)
+        for key, value in meta.items():
+            self.set_meta(key, value)
+        print(f"[DEBUG] Banner catalog refreshed with {len(rows)} entries.")
+        return len(rows)
+
+CATALOG = CosmeticCatalog()
@@ -1,5 +1,6 @@
 import os
 import re
+from functools import lru_cache
 from PIL import Image
 
 Image.MAX_IMAGE_PIXELS = None
@@ -8,7 +9,72 @@ CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 FONT_PATH = os.path.join(CURRENT_DIR, "fonts", "font.ttf")
 PLACEHOLDER_IMAGE = os.path.join(CURRENT_DIR, "placeholder.png")
+LOGO_IMAGE = os.path.join(CURRENT_DIR, "logo.png")
 CACHE_DIR = os.path.join(CURRENT_DIR, "cache")
+CATALOG_PATH = os.path.join(CACHE_DIR, "catalog.sqlite3")
+IMAGE_CACHE_MAX_MB = int(os.getenv("IMAGE_CACHE_MAX_MB", "2048"))
+IMAGE_NEGATIVE_TTL_SECONDS = int(os.getenv("IMAGE_NEGATIVE_TTL_SECONDS", "21600"))
+TILE_CACHE_DIR = os.path.join(CACHE_DIR, "tiles")
+TILE_CACHE_MEMORY_MB = int(os.getenv("TILE_CACHE_MEMORY_MB", "256"))
+TILE_CACHE_DISK_MB = int(os.getenv("TILE_CACHE_DISK_MB", "1024"))
+TILE_CACHE_PRUNE_SECONDS = int(os.getenv("TILE_CACHE_PRUNE_SECONDS", "600"))
+# Icons pre-scaled to the sizes combine_with_background draws them at
+# (tile backgrounds are 512 or 256 px, banners 192 px), stored as raw RGBA.
+ICON_STORE_DIR = os.path.join(CACHE_DIR, "icons")
+ICON_STORE_SIZES = tuple(int(s) for s in os.getenv("ICON_STORE_SIZES", "512,256,192").split(","))
+CATALOG_REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "21600"))
+# Missing banner icons are downloaded in parallel, at most this many at once.
+BANNER_FETCH_CONCURRENCY = int(os.getenv("BANNER_FETCH_CONCURRENCY", "8"))
+# A profile banner missing from the catalog re-checks /v1/banners at most this often.
+BANNER_MISS_REFRESH_SECONDS = int(os.getenv("BANNER_MISS_REFRESH_SECONDS", "300"))
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_KEEPALIVE_SECONDS = int(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+HTTP_DNS_CACHE_SECONDS = int(os.getenv("HTTP_DNS_CACHE_SECONDS", "300"))
+
+# memory, sqlite or redis. Only the shared backends let several bot processes
+# answer buttons for the same session.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", os.path.join(CACHE_DIR, "sessions.sqlite3"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+SESSION_IDLE_TTL_SECONDS = int(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))
+SESSION_COMPACT_ITEMS = os.getenv("SESSION_COMPACT_ITEMS", "true").lower() in ("1", "true", "yes")
+
+GALLERY_PAGE_SIZE = int(os.getenv("GALLERY_PAGE_SIZE", "60"))
+# Grid tiles are rounded down to one of these sizes so the tile caches are
+# shared between lockers of different lengths instead of keyed by grid shape.
+TILE_SIZE_BUCKETS = tuple(
+    sorted((int(s) for s in os.getenv("TILE_SIZE_BUCKETS", "308,231,154,123").split(",")), reverse=True)
+)
+
+# auto, png, webp, webp-lossless or jpeg. "auto" keeps PNG unless it would
+# exceed DISCORD_UPLOAD_LIMIT, then steps down through lossy WebP and JPEG.
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "auto").lower()
+OUTPUT_QUALITY = int(os.getenv("OUTPUT_QUALITY", "90"))
+PNG_COMPRESS_LEVEL = int(os.getenv("PNG_COMPRESS_LEVEL", "3"))
+PNG_QUANTIZE = os.getenv("PNG_QUANTIZE", "false").lower() in ("1", "true", "yes")
+# Renders stay in memory; set to also keep a copy under output/<session>/.
+RENDER_SPILL_TO_DISK = os.getenv("RENDER_SPILL_TO_DISK", "false").lower() in ("1", "true", "yes")
+DISCORD_UPLOAD_LIMIT = int(os.getenv("DISCORD_UPLOAD_LIMIT", str(8 * 1024 * 1024)))
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0")) or os.cpu_count() or 1
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", "0")) or RENDER_WORKERS * 2
+PRERENDER_CONCURRENCY = int(os.getenv("PRERENDER_CONCURRENCY", "1"))
+# Speculative renders skipped while the CPU is saturated are retried after this long.
+PRERENDER_RETRY_SECONDS = float(os.getenv("PRERENDER_RETRY_SECONDS", "5"))
+# Device-code logins waiting on Epic are polled by one shared loop.
+DEVICE_POLL_CONCURRENCY = int(os.getenv("DEVICE_POLL_CONCURRENCY", "8"))
+EPIC_TOKEN_URL = os.getenv(
+    "EPIC_TOKEN_URL", "https://account-public-service-prod.ol.epicgames.com/account/api/oauth/token"
+)
+# Logged-in users' access tokens are refreshed this long before they expire.
+TOKEN_REFRESH_AHEAD_SECONDS = int(os.getenv("TOKEN_REFRESH_AHEAD_SECONDS", "300"))
+# Stream full athena profiles through ijson, skipping item attributes. Peak
+# memory drops about 5x (20 -> 4 MiB for a 3.5 MiB profile) but parsing
+# takes about 4x the CPU of resp.json(); only worth it when memory is tight.
+ATHENA_STREAMING = os.getenv("ATHENA_STREAMING", "false").lower() in ("1", "true", "yes")
 
 RARITY_BACKGROUNDS_V1 = {
     "Common": os.path.join(CURRENT_DIR, "squares", "commun.png"),
@@ -29,8 +95,6 @@ RARITY_BACKGROUNDS_V1 = {
     "Frozen Series": os.path.join(CURRENT_DIR, "squares", "hielo.png"),
 }
 
-ID_PATTERN = re.compile(r"athena(.*?):(.*?)_(.*?)")
-
 RARITY_PRIORITY = {
     "Mythic": 1,
     "Legendary": 2,
@@ -79,6 +143,9 @@ SUB_ORDER = {
     "cid_npc_athena_commando_m_masterkey": 26,
 }
 
+ITEM_ORDER = ["Skins", "Back Blings", "Pickaxes", "Emotes", "Gliders", "Banners"]
+ITEM_ORDER_RANK = {ctype: rank for rank, ctype in enumerate(ITEM_ORDER)}
+
 mythic_ids = [
     "cid_017_athena_commando_m", "cid_028_athena_commando_f", "eid_tidy", "banner_influencerbanner21", "banner_brseason01", "banner_ot1banner", "banner_ot2banner", "banner_ot3banner", "banner_ot4banner", "banner_ot5banner",
     "banner_influencerbanner54", "banner_influencerbanner38", "banner_ot6banner", "banner_ot7banner", "banner_ot8banner", "banner_ot9banner", "banner_ot10banner", "banner_ot11banner",
@@ -133,9 +200,7 @@ mythic_ids = [
     "pickaxe_id_804_fncss20male", "pickaxe_id_stw007_basic","cid_259_athena_commando_m_streetops", "pickaxe_lockjaw"
 ]
 
-converted_mythic_ids = []
-
-banner_name_map = {}
+MYTHIC_IDS = frozenset(m.lower() for m in mythic_ids)
 
 def bool_to_emoji(value: bool) -> str:
     return "<:checkmark:1446727616747798672>" if value else "<:cross:1446753435520204892>"
@@ -163,26 +228,131 @@ def mask_account_id(account_id: str) -> str:
         return account_id[:2] + "*" * (len(account_id) - 4) + account_id[-2:]
     return account_id
 
-def get_cosmetic_type(cosmetic_id: str) -> str:
-    cid = cosmetic_id.lower()
+
+@lru_cache(maxsize=1)
+def _placeholder_bytes() -> bytes:
+    with open(PLACEHOLDER_IMAGE, "rb") as f:
+        return f.read()
+
+
+def is_placeholder_copy(content: bytes) -> bool:
+    """True for a byte-for-byte copy of placeholder.png.
+
+    Old loader.py runs saved one under the icon's name for every download
+    that failed, so such a file means "missing", not a real icon.
+    """
+    placeholder = _placeholder_bytes()
+    return len(content) == len(placeholder) and content == placeholder
+
+# templateId prefix -> category. AthenaDance also holds sprays, emoticons and
+# toys; those are told apart by their id prefix.
+TEMPLATE_TYPES = {
+    "athenacharacter": "Skins",
+    "athenabackpack": "Back Blings",
+    "athenapetcarrier": "Back Blings",
+    "athenapet": "Back Blings",
+    "athenapickaxe": "Pickaxes",
+    "athenadance": "Emotes",
+    "athenaglider": "Gliders",
+    "athenaitemwrap": "Wraps",
+    "athenaspray": "Sprays",
+}
+
+# Leading "<word>_" of a bare cosmetic id -> category.
+ID_PREFIX_TYPES = {
+    "cid": "Skins",
+    "character": "Skins",
+    "bid": "Back Blings",
+    "backpack": "Back Blings",
+    "petcarrier": "Back Blings",
+    "gadget": "Back Blings",
+    "pickaxe": "Pickaxes",
+    "eid": "Emotes",
+    "spid": "Sprays",
+    "spray": "Sprays",
+    "emoji": "Others",
+    "toy": "Others",
+    "glider": "Gliders",
+    "umbrella": "Gliders",
+    "wrap": "Wraps",
+    "banner": "Banners",
+}
+
+_ID_PREFIX = re.compile(r"([a-z]+)_")
+
+
+def _guess_cosmetic_type(cid: str) -> str:
+    """Substring fallback for the few ids without a known prefix (HappyPickaxe...)."""
     if "character_" in cid or "cid_" in cid:
         return "Skins"
     elif "bid_" in cid or "backpack" in cid:
         return "Back Blings"
-    elif (
-        "pickaxe_" in cid or "pickaxe_id_" in cid or
-        "defaultpickaxe" in cid or "halloweenscythe" in cid
-    ):
+    elif "pickaxe" in cid or "halloweenscythe" in cid:
         return "Pickaxes"
     elif "eid" in cid or "emote" in cid:
         return "Emotes"
-    elif "glider" in cid or "founderumbrella" in cid or "founderglider" in cid or "solo_umbrella" in cid:
+    elif "glider" in cid or "umbrella" in cid:
         return "Gliders"
-    elif cid.startswith("banner_"):
-        return "Banners"
     elif "wrap" in cid:
         return "Wraps"
     elif "spray" in cid:
         return "Sprays"
     else:
-        return "Others"
\ No newline at end of file
+        return "Others"
+
+
+def _id_type(cid: str) -> str:
+    match = _ID_PREFIX.match(cid)
+    ctype = ID_PREFIX_TYPES.get(match.group(1)) if match else None
+    return ctype or _guess_cosmetic_type(cid)
+
+
+@lru_cache(maxsize=65536)
+def classify_template(template_id: str) -> tuple[str, str] | None:
+    """Return (cosmetic id, category) for an athena templateId, None otherwise.
+
+    Only athena templates whose id contains an underscore count, as with the
+    regex this replaces.
+    """
+    template, _, cid = template_id.lower().partition(":")
+    if not template.startswith("athena") or "_" not in cid:
+        return None
+    ctype = TEMPLATE_TYPES.get(template, "Others")
+    if ctype == "Emotes" and not cid.startswith("eid_"):
+        ctype = _id_type(cid)
+        if ctype not in ("Sprays", "Others"):
+            ctype = "Emotes"
+    return cid, ctype
+
+
+@lru_cache(maxsize=65536)
+def get_cosmetic_type(cosmetic_id: str) -> str:
+    cid = cosmetic_id.lower()
+    if ":" in cid:
+        classified = classify_template(cid)
+        if classified is not None:
+            return classified[1]
+        cid = cid.partition(":")[2]
+    return _id_type(cid)
+
+
+def classify_items(items: dict) -> dict[str, list[str]]:
+    """Group a profile's item map into {category: [cosmetic ids]} in one pass."""
+    grouped: dict[str, list[str]] = {}
+    for item in items.values():
+        classified = classify_template(item.get("templateId", ""))
+        if classified is not None:
+            cid, ctype = classified
+            grouped.setdefault(ctype, []).append(cid)
+    return grouped
+
+def cosmetic_sort_key(cosmetic_id: str, rarity: str) -> tuple[int, int, int]:
+    """(category, rarity, hand-picked order) rank used to sort lockers."""
+    cid = cosmetic_id.lower()
+    if cid in MYTHIC_IDS:
+        rarity = "Mythic"
+    return (
+        ITEM_ORDER_RANK.get(get_cosmetic_type(cid), len(ITEM_ORDER)),
+        RARITY_PRIORITY.get(rarity, 999),
+        SUB_ORDER.get(cid, 9999),
+    )
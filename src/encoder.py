@@ -0,0 +1,78 @@
+import io
+import time
+from dataclasses import dataclass
+
+from PIL import Image
+
+from src.config import (
+    OUTPUT_FORMAT,
+    OUTPUT_QUALITY,
+    PNG_COMPRESS_LEVEL,
+    PNG_QUANTIZE,
+    DISCORD_UPLOAD_LIMIT,
+)
+
+EXTENSIONS = {
+    "png": "png",
+    "webp": "webp",
+    "webp-lossless": "webp",
+    "jpeg": "jpg",
+}
+
+
+@dataclass
+class EncodedImage:
+    data: bytes
+    format: str
+    extension: str
+    encode_ms: float
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+def _encode_once(image: Image.Image, fmt: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "png":
+        if PNG_QUANTIZE:
+            image = image.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+        image.save(buffer, "PNG", compress_level=PNG_COMPRESS_LEVEL)
+    elif fmt == "webp":
+        image.save(buffer, "WEBP", quality=quality, method=4)
+    elif fmt == "webp-lossless":
+        image.save(buffer, "WEBP", lossless=True, quality=quality, method=2)
+    elif fmt == "jpeg":
+        image.convert("RGB").save(buffer, "JPEG", quality=quality, optimize=True)
+    else:
+        raise ValueError(f"Unsupported output format: {fmt}")
+    return buffer.getvalue()
+
+
+def encode_image(
+    image: Image.Image,
+    fmt: str = OUTPUT_FORMAT,
+    quality: int = OUTPUT_QUALITY,
+    size_limit: int = DISCORD_UPLOAD_LIMIT,
+) -> EncodedImage:
+    """Encode a finished gallery, staying under ``size_limit`` in auto mode."""
+    start = time.perf_counter()
+
+    if fmt == "auto":
+        candidates = [("png", quality), ("webp", quality), ("webp", 75), ("jpeg", 85), ("jpeg", 60)]
+    else:
+        candidates = [(fmt, quality)]
+
+    for candidate, candidate_quality in candidates:
+        data = _encode_once(image, candidate, candidate_quality)
+        if len(data) <= size_limit:
+            break
+    else:
+        print(f"[DEBUG] Encoded image still exceeds {size_limit} bytes ({len(data)}).")
+
+    return EncodedImage(
+        data=data,
+        format=candidate,
+        extension=EXTENSIONS[candidate],
+        encode_ms=(time.perf_counter() - start) * 1000,
+    )
@@ -1,10 +1,13 @@
 import os
 import platform
+import time
 import aiohttp
 import asyncio
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from dotenv import load_dotenv
 
+from src.config import DEVICE_POLL_CONCURRENCY
+
 load_dotenv()
 
 SWITCH_TOKEN = os.getenv("SWITCH_TOKEN")
@@ -48,68 +51,240 @@ class EpicUser:
             in_app_id=data.get("in_app_id", ""),
         )
 
+    def update(self, data: dict) -> None:
+        """Take over the tokens from a refresh_token grant response."""
+        self.raw.update(data)
+        fresh = EpicUser.from_dict(self.raw)
+        for field in fields(self):
+            setattr(self, field.name, getattr(fresh, field.name))
+
+
+@dataclass
+class DeviceCode:
+    verification_url: str
+    device_code: str
+    interval: float = 5
+    expires_in: float = 600
+
+
+class ClientCredentials:
+    """Client-credentials token shared by every EpicGenerator.
+
+    Fetched on first use and fetched again shortly before Epic expires it,
+    instead of one token per login.
+    """
+
+    def __init__(self, margin: float = 60) -> None:
+        self.margin = margin
+        self._token = ""
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _valid(self) -> bool:
+        return bool(self._token) and time.monotonic() < self._expires_at - self.margin
+
+    async def get(self, http: aiohttp.ClientSession, user_agent: str) -> str:
+        if self._valid():
+            return self._token
+        async with self._lock:
+            if self._valid():
+                return self._token
+            async with http.post(
+                "https://account-public-service-prod.ol.epicgames.com/account/api/oauth/token",
+                headers={
+                    "Content-Type": "application/x-www-form-urlencoded",
+                    "User-Agent": user_agent,
+                    "Authorization": f"basic {SWITCH_TOKEN}",
+                },
+                data={"grant_type": "client_credentials"},
+            ) as response:
+                data = await response.json()
+            self._token = data["access_token"]
+            self._expires_at = time.monotonic() + data.get("expires_in", 14400)
+            return self._token
+
+
+CLIENT_CREDENTIALS = ClientCredentials()
+
+
+@dataclass
+class _PendingLogin:
+    http: aiohttp.ClientSession
+    device: DeviceCode
+    user_agent: str
+    future: asyncio.Future
+    interval: float
+    next_poll: float
+    expires_at: float
+
+
+class DeviceCodePoller:
+    """One loop polling Epic for every pending device-code login.
+
+    Each code is polled no more often than the interval Epic handed out,
+    five seconds slower after a slow_down or 429 (as RFC 8628 asks), and
+    fails once it expires. At most ``concurrency`` polls run at a time.
+    """
+
+    def __init__(self, concurrency: int = DEVICE_POLL_CONCURRENCY) -> None:
+        self._pending: dict[str, _PendingLogin] = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def wait(self, http: aiohttp.ClientSession, device: DeviceCode, user_agent: str) -> dict:
+        """Return Epic's token response once the user approves ``device``."""
+        now = time.monotonic()
+        pending = _PendingLogin(
+            http=http,
+            device=device,
+            user_agent=user_agent,
+            future=asyncio.get_running_loop().create_future(),
+            interval=device.interval,
+            next_poll=now + device.interval,
+            expires_at=now + device.expires_in,
+        )
+        self._pending[device.device_code] = pending
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        try:
+            return await pending.future
+        finally:
+            self._pending.pop(device.device_code, None)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for pending in self._pending.values():
+            pending.future.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            due = []
+            deadlines = []
+            for pending in list(self._pending.values()):
+                if pending.future.done():
+                    continue
+                if now >= pending.expires_at:
+                    pending.future.set_exception(TimeoutError("the login code expired"))
+                elif now >= pending.next_poll:
+                    due.append(pending)
+                else:
+                    deadlines.append(min(pending.next_poll, pending.expires_at))
+
+            if due:
+                await asyncio.gather(*[self._poll_safely(pending) for pending in due])
+                continue
+
+            timeout = max(0.0, min(deadlines) - now) if deadlines else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll_safely(self, pending: _PendingLogin) -> None:
+        """Poll one login; a bad response must not kill the shared loop."""
+        try:
+            await self._poll(pending)
+        except Exception as e:
+            print(f"[DEBUG] Device code poll crashed: {e!r}")
+            pending.next_poll = time.monotonic() + pending.interval
+
+    async def _poll(self, pending: _PendingLogin) -> None:
+        status, data = 0, {}
+        async with self._slots:
+            try:
+                async with pending.http.post(
+                    "https://account-public-service-prod03.ol.epicgames.com/account/api/oauth/token",
+                    headers={
+                        "User-Agent": pending.user_agent,
+                        "Authorization": f"basic {SWITCH_TOKEN}",
+                        "Content-Type": "application/x-www-form-urlencoded",
+                    },
+                    data={"grant_type": "device_code", "device_code": pending.device.device_code},
+                ) as request:
+                    status = request.status
+                    data = await request.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                print(f"[DEBUG] Device code poll failed: {e}")
+
+        if pending.future.done():
+            return
+        if not isinstance(data, dict):
+            data = {}
+        if status == 200 and data:
+            pending.future.set_result(data)
+            return
+
+        error = str(data.get("errorCode") or data.get("error") or "")
+        if status == 429 or error.endswith("slow_down"):
+            pending.interval += 5
+        elif error.endswith(("expired_token", "access_denied", "not_found")):
+            pending.future.set_exception(RuntimeError(data.get("errorMessage") or error))
+            return
+        pending.next_poll = time.monotonic() + pending.interval
+
+
+DEVICE_LOGINS = DeviceCodePoller()
+
 
 class EpicGenerator:
-    def __init__(self) -> None:
-        self.http: aiohttp.ClientSession | None = None
+    def __init__(self, http: aiohttp.ClientSession | None = None) -> None:
+        self.http: aiohttp.ClientSession | None = http
+        self._owns_http = http is None
         self.user_agent = f"DeviceAuthGenerator/{platform.system()}/{platform.version()}"
         self.access_token = ""
 
     async def start(self) -> None:
-        self.http = aiohttp.ClientSession(headers={"User-Agent": self.user_agent})
+        if self._owns_http:
+            self.http = aiohttp.ClientSession()
         self.access_token = await self.get_access_token()
 
     async def close(self) -> None:
-        if self.http and not self.http.closed:
+        if self._owns_http and self.http and not self.http.closed:
             await self.http.close()
 
     async def get_access_token(self) -> str:
         assert self.http is not None
-        async with self.http.post(
-            "https://account-public-service-prod.ol.epicgames.com/account/api/oauth/token",
-            headers={
-                "Content-Type": "application/x-www-form-urlencoded",
-                "Authorization": f"basic {SWITCH_TOKEN}",
-            },
-            data={"grant_type": "client_credentials"},
-        ) as response:
-            data = await response.json()
-            return data["access_token"]
+        return await CLIENT_CREDENTIALS.get(self.http, self.user_agent)
 
-    async def create_device_code(self) -> tuple[str, str]:
+    async def create_device_code(self) -> DeviceCode:
         assert self.http is not None
+        self.access_token = await self.get_access_token()
         async with self.http.post(
             "https://account-public-service-prod03.ol.epicgames.com/account/api/oauth/deviceAuthorization",
             headers={
+                "User-Agent": self.user_agent,
                 "Authorization": f"bearer {self.access_token}",
                 "Content-Type": "application/x-www-form-urlencoded",
             },
         ) as response:
             data = await response.json()
-            return data["verification_uri_complete"], data["device_code"]
+            return DeviceCode(
+                verification_url=data["verification_uri_complete"],
+                device_code=data["device_code"],
+                interval=data.get("interval", 5),
+                expires_in=data.get("expires_in", 600),
+            )
 
-    async def wait_for_device_code_completion(self, code: str) -> EpicUser:
+    async def wait_for_device_code_completion(self, device: DeviceCode) -> EpicUser:
         assert self.http is not None
         print("[DEBUG] Polling Epic Games for token...")
-        while True:
-            async with self.http.post(
-                "https://account-public-service-prod03.ol.epicgames.com/account/api/oauth/token",
-                headers={
-                    "Authorization": f"basic {SWITCH_TOKEN}",
-                    "Content-Type": "application/x-www-form-urlencoded",
-                },
-                data={"grant_type": "device_code", "device_code": code},
-            ) as request:
-                token = await request.json()
-                if request.status == 200:
-                    print("[DEBUG] Token received successfully.")
-                    break
-            await asyncio.sleep(5)
+        token = await DEVICE_LOGINS.wait(self.http, device, self.user_agent)
+        print("[DEBUG] Token received successfully.")
 
         print("[DEBUG] Exchanging token...")
         async with self.http.get(
             "https://account-public-service-prod03.ol.epicgames.com/account/api/oauth/exchange",
-            headers={"Authorization": f"bearer {token['access_token']}"},
+            headers={"User-Agent": self.user_agent, "Authorization": f"bearer {token['access_token']}"},
         ) as request:
             exchange = await request.json()
 
@@ -117,6 +292,7 @@ class EpicGenerator:
         async with self.http.post(
             "https://account-public-service-prod03.ol.epicgames.com/account/api/oauth/token",
             headers={
+                "User-Agent": self.user_agent,
                 "Authorization": f"basic {IOS_TOKEN}",
                 "Content-Type": "application/x-www-form-urlencoded",
             },
@@ -129,7 +305,7 @@ class EpicGenerator:
         assert self.http is not None
         async with self.http.get(
             "https://account-public-service-prod03.ol.epicgames.com/account/api/oauth/exchange",
-            headers={"Authorization": f"bearer {user.access_token}"},
+            headers={"User-Agent": self.user_agent, "Authorization": f"bearer {user.access_token}"},
         ) as response:
             data = await response.json()
             return data["code"]
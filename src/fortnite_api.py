@@ -1,5 +1,7 @@
 import aiohttp
 import os
+import time
+from dataclasses import dataclass
 from datetime import datetime
 import asyncio
 
@@ -8,16 +10,43 @@ from src.config import (
     mask_account_id,
     bool_to_emoji,
     country_to_flag,
-    RARITY_PRIORITY,
-    SUB_ORDER,
+    ATHENA_STREAMING,
+    BANNER_FETCH_CONCURRENCY,
+    BANNER_MISS_REFRESH_SECONDS,
+    ITEM_ORDER,
+    MYTHIC_IDS,
+    cosmetic_sort_key,
     get_cosmetic_type,
-    mythic_ids,
+    classify_items,
+    classify_template,
 )
+from src.catalog import CATALOG, row_from_api
+from src.image_cache import IMAGE_CACHE
 from src.epic_auth import EpicUser
+from src.singleflight import SingleFlight
+from src.token_manager import TOKENS
+
+try:
+    import ijson
+except ImportError:  # optional; athena profiles are then read with resp.json()
+    ijson = None
+
+# Concurrent downloads of the same icon (from any user) share one request.
+ICON_DOWNLOADS = SingleFlight()
+# Logins that hit unknown banners at the same time share one catalog re-check.
+BANNER_REFRESHES = SingleFlight()
+
+
+async def _token_for(account_id: str, fallback: str) -> str:
+    """The managed, refreshed token of a logged-in account, else ``fallback``."""
+    if account_id in TOKENS:
+        return await TOKENS.get_valid_token(account_id)
+    return fallback
 
 
 async def set_affiliate(session: aiohttp.ClientSession, account_id: str, access_token: str,
                         affiliate_name: str = "Kayysito") -> dict | str:
+    access_token = await _token_for(account_id, access_token)
     async with session.post(
         f"https://fortnite-public-service-prod11.ol.epicgames.com/fortnite/api/game/v2/profile/{account_id}/client/SetAffiliateName?profileId=common_core",
         headers={
@@ -31,24 +60,110 @@ async def set_affiliate(session: aiohttp.ClientSession, account_id: str, access_
         return await resp.json()
 
 
-async def grab_profile(session: aiohttp.ClientSession, info: dict, profile_id: str = "athena") -> dict | str:
+ACCOUNT_BASE_URL = "https://account-public-service-prod03.ol.epicgames.com/account/api/public/account"
+PROFILE_BASE_URL = "https://fortnite-public-service-prod11.ol.epicgames.com/fortnite/api/game/v2/profile"
+
+VBUCKS_CATEGORIES = (
+    "Currency:MtxPurchased",
+    "Currency:MtxEarned",
+    "Currency:MtxGiveaway",
+    "Currency:MtxPurchaseBonus",
+)
+
+
+def _format_epic_date(raw: str, fmt: str = "%d/%m/%Y") -> str:
+    if raw == "Unknown":
+        return raw
+    return datetime.strptime(raw, "%Y-%m-%dT%H:%M:%S.%fZ").strftime(fmt)
+
+
+def _profile_of(data: dict) -> dict:
+    return data.get("profileChanges", [{}])[0].get("profile", {})
+
+
+_ATHENA_ITEMS = "profileChanges.item.profile.items."
+_ATHENA_ATTRIBUTES = "profileChanges.item.profile.stats.attributes."
+# The only stats attributes parse_account_stats reads.
+_ATHENA_SCALAR_STATS = ("accountLevel", "last_match_end_datetime")
+_ATHENA_SEASONS = _ATHENA_ATTRIBUTES + "past_seasons"
+_ATHENA_CHUNK_SIZE = 64 * 1024
+
+
+async def _stream_athena(resp: aiohttp.ClientResponse) -> dict:
+    """Read a full athena profile keeping only item templateIds and a few stats.
+
+    Items carry large attribute blobs (variants, quest progress...) nothing
+    here uses, so they are skipped as the body streams in instead of being
+    built into dicts. The result has the same shape as the full response,
+    so every parse_* helper works on it.
+    """
+    items = {}
+    attributes = {}
+    revision = -1
+    seasons = None
+    events = ijson.sendable_list()
+    parser = ijson.parse_coro(events, use_float=True)
+    # Events are drained per network chunk, not awaited one at a time.
+    async for chunk in resp.content.iter_chunked(_ATHENA_CHUNK_SIZE):
+        parser.send(chunk)
+        for prefix, event, value in events:
+            if seasons is not None:
+                seasons.event(event, value)
+                if prefix == _ATHENA_SEASONS and event == "end_array":
+                    attributes["past_seasons"] = seasons.value
+                    seasons = None
+            elif event == "string" and prefix.endswith(".templateId") and prefix.startswith(_ATHENA_ITEMS):
+                guid = prefix[len(_ATHENA_ITEMS):-len(".templateId")]
+                if "." not in guid:
+                    items[guid] = {"templateId": value}
+            elif prefix == "profileRevision":
+                revision = value
+            elif prefix == _ATHENA_SEASONS and event == "start_array":
+                seasons = ijson.ObjectBuilder()
+                seasons.event(event, value)
+            elif prefix.startswith(_ATHENA_ATTRIBUTES) and event in ("number", "string"):
+                name = prefix[len(_ATHENA_ATTRIBUTES):]
+                if name in _ATHENA_SCALAR_STATS:
+                    attributes[name] = value
+        del events[:]
+    parser.close()
+
+    profile = {"items": items, "stats": {"attributes": attributes}}
+    return {
+        "profileRevision": revision,
+        "profileChanges": [{"changeType": "fullProfileUpdate", "profile": profile}],
+    }
+
+
+async def _query_profile(
+    session: aiohttp.ClientSession, user: EpicUser, profile_id: str, revision: int = -1
+) -> dict | int:
+    """QueryProfile; with a known ``revision`` Epic answers with deltas since then."""
+    access_token = await _token_for(user.account_id, user.access_token)
     async with session.post(
-        f"https://fortnite-public-service-prod11.ol.epicgames.com/fortnite/api/game/v2/profile/{info['account_id']}/client/QueryProfile?profileId={profile_id}",
-        headers={
-            "Authorization": f"bearer {info['access_token']}",
-            "content-type": "application/json",
-        },
+        f"{PROFILE_BASE_URL}/{user.account_id}/client/QueryProfile?profileId={profile_id}&rvn={revision}",
+        headers={"Authorization": f"bearer {access_token}", "Content-Type": "application/json"},
         json={},
     ) as resp:
         if resp.status != 200:
-            return f"Error ({resp.status})"
-        return await resp.json()
+            return resp.status
+        if profile_id != "athena" or revision != -1 or not ATHENA_STREAMING or ijson is None:
+            return await resp.json()
+
+        started = time.perf_counter()
+        athena = await _stream_athena(resp)
+        print(
+            f"[DEBUG] Streamed athena profile ({len(_profile_of(athena)['items'])} cosmetics "
+            f"and items) in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        return athena
 
 
-async def get_account_info(session: aiohttp.ClientSession, user: EpicUser) -> dict:
+async def _fetch_account(session: aiohttp.ClientSession, user: EpicUser) -> dict:
+    access_token = await _token_for(user.account_id, user.access_token)
     async with session.get(
-        f"https://account-public-service-prod03.ol.epicgames.com/account/api/public/account/{user.account_id}",
-        headers={"Authorization": f"bearer {user.access_token}"},
+        f"{ACCOUNT_BASE_URL}/{user.account_id}",
+        headers={"Authorization": f"bearer {access_token}"},
     ) as resp:
         if resp.status != 200:
             return {"error": f"Error fetching account info ({resp.status})"}
@@ -56,84 +171,46 @@ async def get_account_info(session: aiohttp.ClientSession, user: EpicUser) -> di
         account_info = await resp.json()
         if "email" in account_info:
             account_info["email"] = mask_email(account_info["email"])
-
-        creation_date = account_info.get("created", "Unknown")
-        if creation_date != "Unknown":
-            creation_date = datetime.strptime(creation_date, "%Y-%m-%dT%H:%M:%S.%fZ").strftime("%d/%m/%Y")
-        account_info["creation_date"] = creation_date
-
-    external_auths_url = f"https://account-public-service-prod03.ol.epicgames.com/account/api/public/account/{user.account_id}/externalAuths"
-    async with session.get(external_auths_url, headers={"Authorization": f"bearer {user.access_token}"}) as ext_resp:
-        if ext_resp.status == 200:
-            account_info["externalAuths"] = await ext_resp.json()
-        else:
-            account_info["externalAuths"] = []
-
-    return account_info
+        account_info["creation_date"] = _format_epic_date(account_info.get("created", "Unknown"))
+        return account_info
 
 
-async def get_vbucks_info(session: aiohttp.ClientSession, user: EpicUser) -> dict:
-    async with session.post(
-        f"https://fortnite-public-service-prod11.ol.epicgames.com/fortnite/api/game/v2/profile/{user.account_id}/client/QueryProfile?profileId=common_core&rvn=-1",
-        headers={"Authorization": f"bearer {user.access_token}", "Content-Type": "application/json"},
-        json={},
+async def _fetch_external_auths(session: aiohttp.ClientSession, user: EpicUser) -> list:
+    access_token = await _token_for(user.account_id, user.access_token)
+    async with session.get(
+        f"{ACCOUNT_BASE_URL}/{user.account_id}/externalAuths",
+        headers={"Authorization": f"bearer {access_token}"},
     ) as resp:
         if resp.status != 200:
-            return {"error": f"Error fetching V-Bucks info ({resp.status})"}
-        data = await resp.json()
+            return []
+        return await resp.json()
 
-    vbucks_categories = [
-        "Currency:MtxPurchased",
-        "Currency:MtxEarned",
-        "Currency:MtxGiveaway",
-        "Currency:MtxPurchaseBonus",
-    ]
+
+def parse_vbucks(common_core: dict) -> dict:
     total_vbucks = 0
-    items_data = data.get("profileChanges", [{}])[0].get("profile", {}).get("items", {})
-    for item_data in items_data.values():
-        if item_data.get("templateId") in vbucks_categories:
+    for item_data in _profile_of(common_core).get("items", {}).values():
+        if item_data.get("templateId") in VBUCKS_CATEGORIES:
             total_vbucks += item_data.get("quantity", 0)
-
     return {"totalAmount": total_vbucks}
 
 
-async def get_profile_info(session: aiohttp.ClientSession, user: EpicUser) -> dict:
-    async with session.post(
-        f"https://fortnite-public-service-prod11.ol.epicgames.com/fortnite/api/game/v2/profile/{user.account_id}/client/QueryProfile?profileId=common_core&rvn=-1",
-        headers={"Authorization": f"bearer {user.access_token}"},
-        json={},
-    ) as resp:
-        if resp.status != 200:
-            return {"error": f"Error fetching profile info ({resp.status})"}
-        profile_info = await resp.json()
-
-    creation_date = profile_info.get("profileChanges", [{}])[0].get("profile", {}).get("created", "Unknown")
-    if creation_date != "Unknown":
-        creation_date = datetime.strptime(creation_date, "%Y-%m-%dT%H:%M:%S.%fZ").strftime("%d/%m/%Y")
-    profile_info["creation_date"] = creation_date
-
-    external_auths_url = f"https://account-public-service-prod03.ol.epicgames.com/account/api/public/account/{user.account_id}/externalAuths"
-    async with session.get(external_auths_url, headers={"Authorization": f"bearer {user.access_token}"}) as external_resp:
-        if external_resp.status == 200:
-            profile_info["externalAuths"] = await external_resp.json()
-        else:
-            profile_info["externalAuths"] = []
-
-    return profile_info
+def parse_creation_date(common_core: dict) -> str:
+    return _format_epic_date(_profile_of(common_core).get("created", "Unknown"))
 
 
-async def get_account_stats(session: aiohttp.ClientSession, user: EpicUser) -> dict:
-    async with session.post(
-        f"https://fortnite-public-service-prod11.ol.epicgames.com/fortnite/api/game/v2/profile/{user.account_id}/client/QueryProfile?profileId=athena&rvn=-1",
-        headers={"Authorization": f"bearer {user.access_token}", "Content-Type": "application/json"},
-        json={},
-    ) as resp:
-        if resp.status != 200:
-            return {"error": f"Error fetching account stats ({resp.status})"}
+def parse_banner_ids(common_core: dict) -> list[str]:
+    result = []
+    for info_item in _profile_of(common_core).get("items", {}).values():
+        template_id = info_item.get("templateId", "").lower()
+        if template_id.startswith("homebasebanner:") or template_id.startswith("homebasebannericon:"):
+            splitted = template_id.split(":")
+            if len(splitted) == 2:
+                result.append(splitted[1])
+    return result
 
-        data = await resp.json()
 
-    attributes = data.get("profileChanges", [{}])[0].get("profile", {}).get("stats", {}).get("attributes", {})
+def parse_account_stats(athena: dict) -> dict:
+    attributes = _profile_of(athena).get("stats", {}).get("attributes", {})
     account_level = attributes.get("accountLevel", 0)
     past_seasons = attributes.get("past_seasons", [])
 
@@ -174,96 +251,192 @@ async def get_account_stats(session: aiohttp.ClientSession, user: EpicUser) -> d
     }
 
 
-async def get_banners_from_common_core(session: aiohttp.ClientSession, user: EpicUser) -> list[str]:
-    url = f"https://fortnite-public-service-prod11.ol.epicgames.com/fortnite/api/game/v2/profile/{user.account_id}/client/QueryProfile?profileId=common_core&rvn=-1"
-    async with session.post(
-        url,
-        headers={"Authorization": f"bearer {user.access_token}"},
-        json={},
-    ) as resp:
-        if resp.status != 200:
-            return []
-        data = await resp.json()
-
-    items = data.get("profileChanges", [{}])[0].get("profile", {}).get("items", {})
-    result = []
-    for _, info_item in items.items():
-        template_id = info_item.get("templateId", "").lower()
-        if template_id.startswith("homebasebanner:") or template_id.startswith("homebasebannericon:"):
-            splitted = template_id.split(":")
-            if len(splitted) == 2:
-                banner_id = splitted[1]
-                result.append(banner_id)
-    return result
-
+def parse_locker_items(athena: dict) -> dict[str, list[str]]:
+    return classify_items(_profile_of(athena).get("items", {}))
 
-async def download_and_prepare_banners(session: aiohttp.ClientSession, user: EpicUser) -> list[str]:
-    from src.config import CACHE_DIR, banner_name_map
-    banner_ids_in_profile = await get_banners_from_common_core(session, user)
-    if not banner_ids_in_profile:
-        return []
 
-    async with session.get("https://fortnite-api.com/v1/banners") as resp:
-        if resp.status != 200:
-            all_data = {}
-        else:
-            full_data = await resp.json()
-            all_data = {b["id"].lower(): b for b in full_data.get("data", [])}
+def parse_locker_state(athena: dict) -> dict:
+    """Profile revision plus item guid -> templateId for every cosmetic.
 
-    os.makedirs(CACHE_DIR, exist_ok=True)
+    This is what a session keeps so a later refresh can ask Epic for the
+    changes since ``rvn`` instead of the whole profile.
+    """
+    items = _profile_of(athena).get("items", {})
+    return {
+        "rvn": athena.get("profileRevision", -1),
+        "items": {
+            guid: item["templateId"]
+            for guid, item in items.items()
+            if classify_template(item.get("templateId", "")) is not None
+        },
+    }
 
-    final_ids = []
-    for bn in banner_ids_in_profile:
-        cid = f"banner_{bn.lower()}"
-        path_img = os.path.join(CACHE_DIR, f"{cid}.png")
-        info = all_data.get(bn.lower())
-        if not info:
-            continue
 
-        banner_name = info.get("devName", f"Banner {cid}")
-        banner_name_map[cid] = banner_name
+def locker_items_from_state(state: dict) -> dict[str, list[str]]:
+    return classify_items({guid: {"templateId": tid} for guid, tid in state["items"].items()})
+
+
+def apply_profile_changes(state: dict, response: dict) -> set[str]:
+    """Apply a QueryProfile response to ``state`` in place.
+
+    Handles both itemAdded/itemRemoved deltas and the fullProfileUpdate Epic
+    sends when it cannot produce deltas. Returns the categories whose items
+    changed.
+    """
+    items = state["items"]
+    changed = set()
+
+    def touch(template_id: str) -> None:
+        classified = classify_template(template_id)
+        if classified is not None:
+            changed.add(classified[1])
+
+    for change in response.get("profileChanges", []):
+        change_type = change.get("changeType")
+        if change_type == "fullProfileUpdate":
+            fresh = parse_locker_state({"profileChanges": [change]})["items"]
+            for guid in items.keys() - fresh.keys():
+                touch(items[guid])
+            for guid in fresh.keys() - items.keys():
+                touch(fresh[guid])
+            items.clear()
+            items.update(fresh)
+        elif change_type == "itemAdded":
+            template_id = change.get("item", {}).get("templateId", "")
+            if classify_template(template_id) is not None:
+                items[change["itemId"]] = template_id
+                touch(template_id)
+        elif change_type == "itemRemoved":
+            template_id = items.pop(change.get("itemId"), None)
+            if template_id is not None:
+                touch(template_id)
+        # Attribute, quantity and stat changes never change which cosmetics are owned.
+
+    state["rvn"] = response.get("profileRevision", state["rvn"])
+    return changed
+
+
+async def fetch_locker_changes(session: aiohttp.ClientSession, user: EpicUser, state: dict) -> set[str] | int:
+    """Bring ``state`` up to date with the live athena profile.
+
+    Returns the changed categories, or the HTTP status on error.
+    """
+    response = await _query_profile(session, user, "athena", revision=state["rvn"])
+    if isinstance(response, int):
+        return response
+    return apply_profile_changes(state, response)
+
+
+@dataclass
+class ProfileSnapshot:
+    """Everything fetched from Epic for one login, one request per endpoint."""
+
+    account: dict
+    external_auths: list
+    common_core: dict | int
+    athena: dict | int
+
+    @property
+    def error(self) -> str | None:
+        if "error" in self.account:
+            return self.account["error"]
+        if isinstance(self.athena, int):
+            return "Error fetching profile"
+        return None
+
+    @property
+    def vbucks(self) -> dict:
+        if isinstance(self.common_core, int):
+            return {"error": f"Error fetching V-Bucks info ({self.common_core})"}
+        return parse_vbucks(self.common_core)
+
+    @property
+    def creation_date(self) -> str:
+        if not isinstance(self.common_core, int):
+            creation_date = parse_creation_date(self.common_core)
+            if creation_date != "Unknown":
+                return creation_date
+        return self.account.get("creation_date", "Unknown")
+
+    @property
+    def banner_ids(self) -> list[str]:
+        if isinstance(self.common_core, int):
+            return []
+        return parse_banner_ids(self.common_core)
+
+    @property
+    def stats(self) -> dict:
+        if isinstance(self.athena, int):
+            return {"error": f"Error fetching account stats ({self.athena})"}
+        return parse_account_stats(self.athena)
+
+    @property
+    def locker_items(self) -> dict[str, list[str]]:
+        if isinstance(self.athena, int):
+            return {}
+        return parse_locker_items(self.athena)
+
+    @property
+    def locker_state(self) -> dict | None:
+        if isinstance(self.athena, int):
+            return None
+        return parse_locker_state(self.athena)
+
+
+async def fetch_profile_snapshot(session: aiohttp.ClientSession, user: EpicUser) -> ProfileSnapshot:
+    account, external_auths, common_core, athena = await asyncio.gather(
+        _fetch_account(session, user),
+        _fetch_external_auths(session, user),
+        _query_profile(session, user, "common_core"),
+        _query_profile(session, user, "athena"),
+    )
+    account["externalAuths"] = external_auths
+    return ProfileSnapshot(
+        account=account,
+        external_auths=external_auths,
+        common_core=common_core,
+        athena=athena,
+    )
 
-        icon_url = info.get("images", {}).get("icon")
-        if not icon_url:
-            continue
 
-        if os.path.exists(path_img) and os.path.getsize(path_img) > 0:
-            final_ids.append(cid)
-            continue
+async def download_and_prepare_banners(session: aiohttp.ClientSession, banner_ids_in_profile: list[str]) -> list[str]:
+    """Map profile banner ids to catalog ids whose icon is cached, fetching missing icons."""
+    if not banner_ids_in_profile:
+        return []
 
-        async with session.get(icon_url) as r2:
-            if r2.status == 200:
-                content = await r2.read()
-                with open(path_img, "wb") as f:
-                    f.write(content)
-                final_ids.append(cid)
+    ids = [f"banner_{bn.lower()}" for bn in banner_ids_in_profile]
+    known = CATALOG.get_banners(ids)
+    if len(known) < len(set(ids)):
+        # Empty catalog or a banner newer than our copy of the list.
+        await BANNER_REFRESHES.do(
+            "banners", lambda: CATALOG.refresh_banners(session, max_age=BANNER_MISS_REFRESH_SECONDS)
+        )
+        known = CATALOG.get_banners(ids)
+    slots = asyncio.Semaphore(BANNER_FETCH_CONCURRENCY)
 
-    return final_ids
+    async def fetch(cid: str, icon_url: str):
+        async with slots:
+            return await ICON_DOWNLOADS.do(cid, lambda: IMAGE_CACHE.fetch(session, cid, [icon_url]))
 
+    wanted = [cid for cid in ids if cid in known and known[cid][1]]
+    paths = await asyncio.gather(*(fetch(cid, known[cid][1]) for cid in wanted))
+    return [cid for cid, path in zip(wanted, paths) if path]
 
-async def get_cosmetic_info(cosmetic_id: str, session: aiohttp.ClientSession) -> dict:
-    from src.config import banner_name_map
 
+def _banner_info(cosmetic_id: str) -> dict:
     cid_lower = cosmetic_id.lower()
-    if cid_lower.startswith("banner_"):
-        if cid_lower in banner_name_map:
-            real_name = banner_name_map[cid_lower]
-        else:
-            real_name = f"Banner {cosmetic_id}"
+    known = CATALOG.get_banners([cid_lower]).get(cid_lower)
+    real_name = known[0] if known else f"Banner {cosmetic_id}"
 
-        rarity = "Mythic" if cid_lower in [m.lower() for m in mythic_ids] else "Uncommon"
-        return {"id": cosmetic_id, "rarity": rarity, "name": real_name}
+    rarity = "Mythic" if cid_lower in MYTHIC_IDS else "Uncommon"
+    return {"id": cosmetic_id, "rarity": rarity, "name": real_name}
 
-    url = f"https://fortnite-api.com/v2/cosmetics/br/{cosmetic_id}"
-    async with session.get(url) as resp:
-        if resp.status != 200:
-            return {"id": cosmetic_id, "rarity": "Common", "name": "Unknown"}
-        data = await resp.json()
 
-    rarity = data.get("data", {}).get("rarity", {}).get("displayValue", "Common")
-    name = data.get("data", {}).get("name", "Unknown")
+def _info_from_entry(cosmetic_id: str, entry: dict) -> dict:
+    rarity = entry.get("rarity", "Common")
+    name = entry.get("name", "Unknown")
 
-    if cid_lower in [m.lower() for m in mythic_ids]:
+    if cosmetic_id.lower() in MYTHIC_IDS:
         rarity = "Mythic"
 
     if name == "Unknown":
@@ -271,50 +444,87 @@ async def get_cosmetic_info(cosmetic_id: str, session: aiohttp.ClientSession) ->
     return {"id": cosmetic_id, "rarity": rarity, "name": name}
 
 
-async def download_cosmetic_images(ids: list[str], session: aiohttp.ClientSession):
-    import os
-    from src.config import CACHE_DIR, PLACEHOLDER_IMAGE
+async def _fetch_cosmetic_entry(cosmetic_id: str, session: aiohttp.ClientSession) -> dict | None:
+    url = f"https://fortnite-api.com/v2/cosmetics/br/{cosmetic_id}"
+    async with session.get(url) as resp:
+        if resp.status == 404:
+            # New or encrypted items; remembered so every render does not ask again.
+            CATALOG.record_misses([cosmetic_id])
+        if resp.status != 200:
+            return None
+        data = await resp.json()
 
-    os.makedirs(CACHE_DIR, exist_ok=True)
+    row = row_from_api(data.get("data") or {"id": cosmetic_id})
+    CATALOG.upsert_many([row])
+    _, name, rarity, ctype, series = row
+    return {"name": name, "rarity": rarity, "type": ctype, "series": series}
 
-    async def _download(cid: str):
-        cid_lower = cid.lower()
+
+async def get_cosmetic_infos(ids: list[str], session: aiohttp.ClientSession) -> list[dict]:
+    """Resolve many cosmetics, hitting fortnite-api only for catalog misses."""
+    known = CATALOG.get_many([i for i in ids if not i.lower().startswith("banner_")])
+    missing = {
+        i.lower() for i in ids
+        if not i.lower().startswith("banner_") and i.lower() not in known
+    }
+    if missing:
+        missing -= CATALOG.recent_misses(list(missing))
+    if missing:
+        print(f"[DEBUG] {len(missing)} cosmetics missing from catalog, fetching individually.")
+        fetched = await asyncio.gather(*[_fetch_cosmetic_entry(i, session) for i in missing])
+        for cid, entry in zip(missing, fetched):
+            if entry is not None:
+                known[cid] = entry
+
+    result = []
+    for cosmetic_id in ids:
+        cid_lower = cosmetic_id.lower()
         if cid_lower.startswith("banner_"):
-            return  # already handled as banner icon
+            result.append(_banner_info(cosmetic_id))
+        elif cid_lower in known:
+            result.append(_info_from_entry(cosmetic_id, known[cid_lower]))
+        else:
+            result.append({"id": cosmetic_id, "rarity": "Common", "name": "Unknown"})
+    return result
 
-        img_path = os.path.join(CACHE_DIR, f"{cid}.png")
-        if os.path.exists(img_path) and os.path.getsize(img_path) > 0:
-            return
 
+async def download_cosmetic_images(ids: list[str], session: aiohttp.ClientSession):
+    async def _download(cid: str):
         urls = [
             f"https://fortnite-api.com/images/cosmetics/br/{cid}/icon.png",
             f"https://fortnite-api.com/images/cosmetics/br/{cid}/smallicon.png",
         ]
-        for url in urls:
-            async with session.get(url) as r2:
-                if r2.status == 200:
-                    content = await r2.read()
-                    with open(img_path, "wb") as f:
-                        f.write(content)
-                    return
-
-        with open(img_path, "wb") as f_dst, open(PLACEHOLDER_IMAGE, "rb") as f_src:
-            f_dst.write(f_src.read())
-
-    await asyncio.gather(*[_download(i) for i in ids])
-
-
-async def sort_ids_by_rarity(ids: list[str], session: aiohttp.ClientSession, item_order: list[str]) -> list[str]:
-    info_list = await asyncio.gather(*[get_cosmetic_info(i, session) for i in ids])
-
-    def get_sort_key(info: dict):
-        rarity = info.get("rarity", "Common")
-        cid = info.get("id", "")
-        ctype = get_cosmetic_type(cid)
-        item_order_rank = item_order.index(ctype) if ctype in item_order else len(item_order)
-        rarity_rank = RARITY_PRIORITY.get(rarity, 999)
-        sub_rank = SUB_ORDER.get(cid.lower(), 9999)
-        return (item_order_rank, rarity_rank, sub_rank)
-
-    sorted_info = sorted(info_list, key=get_sort_key)
-    return [x["id"] for x in sorted_info]
+        await IMAGE_CACHE.fetch(session, cid, urls)
+
+    # Banner icons come from download_and_prepare_banners; joining one of its
+    # in-flight downloads under the same key must not go through _download.
+    cosmetics = [i for i in ids if not i.lower().startswith("banner_")]
+    await asyncio.gather(*[ICON_DOWNLOADS.do(i.lower(), lambda i=i: _download(i)) for i in cosmetics])
+    await asyncio.to_thread(IMAGE_CACHE.touch_many, ids)
+
+
+async def sort_ids_by_rarity(
+    ids: list[str], session: aiohttp.ClientSession, item_order: list[str] = ITEM_ORDER
+) -> list[str]:
+    lookup = [i for i in ids if not i.lower().startswith("banner_")]
+    keys = CATALOG.sort_keys(lookup)
+    missing = [i for i in lookup if i.lower() not in keys]
+    if missing:
+        # Resolving the misses stores them in the catalog, which indexes them.
+        await get_cosmetic_infos(missing, session)
+        keys.update(CATALOG.sort_keys(missing))
+
+    def get_sort_key(cid: str):
+        cid_lower = cid.lower()
+        key = keys.get(cid_lower)
+        if key is None:
+            # Banners sort as Uncommon; ids fortnite-api does not know have no
+            # rarity, so they go after every known item of their category.
+            key = cosmetic_sort_key(cid_lower, "Uncommon" if cid_lower.startswith("banner_") else "Unknown")
+        if item_order != ITEM_ORDER:
+            ctype = get_cosmetic_type(cid_lower)
+            key = (item_order.index(ctype) if ctype in item_order else len(item_order),) + key[1:]
+        # The id breaks ties, so the order does not depend on the profile's item order.
+        return key + (cid_lower,)
+
+    return sorted(ids, key=get_sort_key)
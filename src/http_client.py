@@ -0,0 +1,48 @@
+import asyncio
+
+import aiohttp
+
+from src.config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP_KEEPALIVE_SECONDS,
+    HTTP_DNS_CACHE_SECONDS,
+)
+
+
+class HttpClient:
+    """Process-wide aiohttp session so every command reuses warm connections."""
+
+    def __init__(self) -> None:
+        self._session: aiohttp.ClientSession | None = None
+
+    async def start(self) -> None:
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+            ttl_dns_cache=HTTP_DNS_CACHE_SECONDS,
+            use_dns_cache=True,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(connect=10, sock_read=60),
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HttpClient.start() must be awaited before use")
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            # Give SSL transports a moment to finish their close handshake.
+            await asyncio.sleep(0.25)
+        self._session = None
+
+
+HTTP = HttpClient()
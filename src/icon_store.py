@@ -0,0 +1,105 @@
+import io
+import mmap
+import os
+
+from PIL import Image, UnidentifiedImageError
+
+from src.config import ICON_STORE_DIR, ICON_STORE_SIZES, PLACEHOLDER_IMAGE, is_placeholder_copy
+
+
+def _icon_name(source_path: str) -> str:
+    return os.path.splitext(os.path.basename(source_path))[0].lower()
+
+
+def store_path(name: str, size: int) -> str:
+    return os.path.join(ICON_STORE_DIR, str(size), f"{name}.rgba")
+
+
+def _is_fresh(path: str, source_path: str, size: int) -> bool:
+    try:
+        st = os.stat(path)
+        source = os.stat(source_path)
+    except OSError:
+        return False
+    return st.st_size == size * size * 4 and st.st_mtime_ns >= source.st_mtime_ns
+
+
+def _map(path: str, size: int) -> Image.Image:
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # The image keeps the mapping alive; pixels come straight from the page cache.
+    return Image.frombuffer("RGBA", (size, size), buffer, "raw", "RGBA", 0, 1)
+
+
+def _write(path: str, img: Image.Image) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(img.tobytes())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[DEBUG] Failed to store icon {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _decode(source_path: str) -> Image.Image | None:
+    try:
+        with open(source_path, "rb") as f:
+            content = f.read()
+    except OSError:
+        return None
+    # Old loader runs saved copies of the placeholder for missing icons. They
+    # are not icons; callers fall back to the placeholder itself, stored once.
+    if os.path.abspath(source_path) != os.path.abspath(PLACEHOLDER_IMAGE) and is_placeholder_copy(content):
+        return None
+    try:
+        with Image.open(io.BytesIO(content)) as img:
+            return img.convert("RGBA")
+    except (UnidentifiedImageError, OSError):
+        return None
+
+
+def ingest_icon(source_path: str, sizes: tuple[int, ...] = ICON_STORE_SIZES) -> bool:
+    """Decode ``source_path`` once and write every stale size to the store."""
+    name = _icon_name(source_path)
+    stale = [s for s in sizes if not _is_fresh(store_path(name, s), source_path, s)]
+    if not stale:
+        return True
+    img = _decode(source_path)
+    if img is None:
+        return False
+    for size in stale:
+        _write(store_path(name, size), img.resize((size, size), Image.Resampling.LANCZOS))
+    return True
+
+
+def load_icon(source_path: str, size: int) -> Image.Image | None:
+    """Return the icon at ``size`` x ``size``, scaling and storing it on first use.
+
+    The result matches ``Image.open(source_path).convert("RGBA")`` resized
+    with LANCZOS, so tiles look the same whether or not the store was warm.
+    Returns None when the source is missing or not a usable image.
+    """
+    path = store_path(_icon_name(source_path), size)
+    if _is_fresh(path, source_path, size):
+        try:
+            return _map(path, size)
+        except (OSError, ValueError):
+            pass
+
+    img = _decode(source_path)
+    if img is None:
+        return None
+    img = img.resize((size, size), Image.Resampling.LANCZOS)
+    _write(path, img)
+    return img
+
+
+def discard_icon(name: str) -> None:
+    for size in ICON_STORE_SIZES:
+        try:
+            os.remove(store_path(name, size))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,244 @@
+import asyncio
+import io
+import os
+import sqlite3
+import threading
+import time
+
+import aiohttp
+from PIL import Image, UnidentifiedImageError
+
+from src.config import CACHE_DIR, IMAGE_CACHE_MAX_MB, IMAGE_NEGATIVE_TTL_SECONDS, is_placeholder_copy
+from src.icon_store import discard_icon
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    cid TEXT PRIMARY KEY,
+    url TEXT,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL,
+    negative INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS images_last_access ON images (last_access);
+"""
+
+
+# Worth retrying: rate limiting and upstream hiccups, not 404s.
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+
+def is_valid_png(content: bytes) -> bool:
+    try:
+        with Image.open(io.BytesIO(content)) as img:
+            if img.format != "PNG":
+                return False
+            img.verify()
+        return True
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        return False
+
+
+class ImageCache:
+    """Cosmetic icons on disk, tracked by a manifest.
+
+    Files are written to a temp name and renamed into place only after the
+    bytes decode as a PNG, so a crash can never leave a truncated icon that
+    looks valid. Icons that could not be fetched are remembered for
+    ``negative_ttl`` seconds and then retried, instead of being replaced by a
+    permanent placeholder copy. The least recently used icons are deleted
+    once the directory grows past ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        directory: str = CACHE_DIR,
+        max_bytes: int = IMAGE_CACHE_MAX_MB * 1024 * 1024,
+        negative_ttl: float = IMAGE_NEGATIVE_TTL_SECONDS,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.negative_ttl = negative_ttl
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+
+    def open(self) -> None:
+        if self._conn is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(self.directory, "manifest.sqlite3"), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        self._conn = conn
+        self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM images").fetchone()[0]
+
+    def path_for(self, cid: str) -> str:
+        # Same case folding as the manifest, so both always agree on one file.
+        return os.path.join(self.directory, f"{cid.lower()}.png")
+
+    def _entry(self, cid: str) -> tuple[float, int] | None:
+        row = self._conn.execute(
+            "SELECT fetched_at, negative FROM images WHERE cid = ?", (cid.lower(),)
+        ).fetchone()
+        return row
+
+    def _adopt(self, cid: str) -> bool:
+        """Bring a file written before the manifest existed under management.
+
+        Placeholder copies left by old loader runs are deleted and recorded as
+        a failed fetch, so the icon is downloaded again instead of kept forever.
+        """
+        path = self.path_for(cid)
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+        except OSError:
+            return False
+        if is_placeholder_copy(content):
+            os.remove(path)
+            discard_icon(cid)
+            self._record(cid, None, 0, negative=True)
+            return False
+        if not is_valid_png(content):
+            os.remove(path)
+            return False
+        self._record(cid, None, len(content), negative=False)
+        return True
+
+    def _record(self, cid: str, url: str | None, size: int, negative: bool) -> None:
+        now = time.time()
+        with self._conn:
+            old = self._conn.execute("SELECT size FROM images WHERE cid = ?", (cid.lower(),)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images (cid, url, fetched_at, last_access, size, negative) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (cid.lower(), url, now, now, size, int(negative)),
+            )
+        self._total_bytes += size - (old[0] if old else 0)
+
+    def status(self, cid: str) -> str:
+        """Return "hit", "negative" (recently failed) or "miss"."""
+        self.open()
+        with self._lock:
+            entry = self._entry(cid)
+            if entry is None:
+                return "hit" if os.path.exists(self.path_for(cid)) and self._adopt(cid) else "miss"
+            fetched_at, negative = entry
+            if negative:
+                return "negative" if time.time() - fetched_at < self.negative_ttl else "miss"
+            if not os.path.exists(self.path_for(cid)):
+                with self._conn:
+                    self._conn.execute("DELETE FROM images WHERE cid = ?", (cid.lower(),))
+                return "miss"
+            return "hit"
+
+    def touch_many(self, cids: list[str]) -> None:
+        self.open()
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE images SET last_access = ? WHERE cid = ?", [(now, c.lower()) for c in cids]
+            )
+
+    def store(self, cid: str, content: bytes, url: str | None = None) -> bool:
+        if not is_valid_png(content):
+            return False
+        self.open()
+        path = self.path_for(cid)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[DEBUG] Failed to cache image {cid}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        with self._lock:
+            self._record(cid, url, len(content), negative=False)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        return True
+
+    def mark_missing(self, cid: str, url: str | None = None) -> None:
+        self.open()
+        with self._lock:
+            self._record(cid, url, 0, negative=True)
+
+    def _evict(self) -> None:
+        # Free a little more than needed so we do not evict on every store.
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT cid, size FROM images WHERE negative = 0 ORDER BY last_access"
+        ).fetchall()
+        evicted = []
+        for cid, size in rows:
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(self.path_for(cid))
+            except FileNotFoundError:
+                pass
+            discard_icon(cid)
+            self._total_bytes -= size
+            evicted.append((cid,))
+        with self._conn:
+            self._conn.executemany("DELETE FROM images WHERE cid = ?", evicted)
+        print(f"[DEBUG] Evicted {len(evicted)} icons from the image cache.")
+
+    async def _download(
+        self, session: aiohttp.ClientSession, url: str, retries: int, backoff: float
+    ) -> bytes | None:
+        for attempt in range(retries + 1):
+            try:
+                async with session.get(url) as resp:
+                    if resp.status == 200:
+                        return await resp.read()
+                    if resp.status not in TRANSIENT_STATUSES or attempt == retries:
+                        return None
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == retries:
+                    raise
+            await asyncio.sleep(backoff * 2 ** attempt)
+        return None
+
+    async def fetch(
+        self,
+        session: aiohttp.ClientSession,
+        cid: str,
+        urls: list[str],
+        retries: int = 0,
+        backoff: float = 0.5,
+    ) -> str | None:
+        """Return the cached icon path, downloading it from ``urls`` if needed.
+
+        Returns None when no URL produced a valid PNG; callers should fall back
+        to the placeholder for this render only. Transient failures are retried
+        ``retries`` times with exponential backoff.
+        """
+        status = await asyncio.to_thread(self.status, cid)
+        if status == "hit":
+            return self.path_for(cid)
+        if status == "negative":
+            return None
+
+        for url in urls:
+            content = await self._download(session, url, retries, backoff)
+            if content is None:
+                continue
+            if await asyncio.to_thread(self.store, cid, content, url):
+                return self.path_for(cid)
+
+        await asyncio.to_thread(self.mark_missing, cid, urls[-1] if urls else None)
+        return None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+IMAGE_CACHE = ImageCache()
@@ -2,18 +2,111 @@ import io
 import math
 import os
 import asyncio
-from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Iterable
 
 from PIL import Image, ImageDraw, ImageFont, UnidentifiedImageError
 
 from src.config import (
     CACHE_DIR,
     FONT_PATH,
+    GALLERY_PAGE_SIZE,
+    LOGO_IMAGE,
     PLACEHOLDER_IMAGE,
     RARITY_BACKGROUNDS_V1,
+    TILE_SIZE_BUCKETS,
 )
 from src.config import get_cosmetic_type 
-from src.fortnite_api import get_cosmetic_info, download_cosmetic_images
+from src.fortnite_api import get_cosmetic_infos, download_cosmetic_images
+from src.encoder import encode_image
+from src.icon_store import load_icon
+from src.render_pool import RENDER_POOL
+from src.tile_cache import TILE_MEMORY_CACHE, tile_key, load_tile, store_tile
+
+# Per-process cache, filled once by init_render_worker in each pool worker.
+_BACKGROUNDS: dict[str, Image.Image] = {}
+
+
+@lru_cache(maxsize=None)
+def get_font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    try:
+        return ImageFont.truetype(FONT_PATH, size=size)
+    except IOError:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=4096)
+def measure_text(text: str, size: int) -> tuple[int, int]:
+    bbox = get_font(size).getbbox(text)
+    return bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+
+@lru_cache(maxsize=16384)
+def fit_font_size(texts: tuple[str, ...], max_width: int, base_size: int, min_size: int) -> int:
+    """Largest size in (min_size, base_size] at which every text fits max_width.
+
+    Falls back to min_size when nothing fits, like the old one-point-at-a-time
+    loops did. Text width grows with font size, so a binary search over the
+    cached measurements finds the same size in a handful of probes.
+    """
+    def fits(size: int) -> bool:
+        return all(measure_text(t, size)[0] <= max_width for t in texts)
+
+    if base_size <= min_size or fits(base_size):
+        return base_size
+
+    best = min_size
+    lo, hi = min_size + 1, base_size - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if fits(mid):
+            best = mid
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    return best
+
+
+def _load_background(path: str) -> Image.Image:
+    background = _BACKGROUNDS.get(path)
+    if background is None:
+        try:
+            background = Image.open(path).convert("RGBA")
+        except (UnidentifiedImageError, IOError):
+            background = Image.new("RGBA", (512, 512), (0, 0, 0, 0))
+        _BACKGROUNDS[path] = background
+    return background
+
+
+def init_render_worker() -> None:
+    for path in set(RARITY_BACKGROUNDS_V1.values()):
+        _load_background(path)
+    for size in range(10, 81):
+        get_font(size)
+
+
+def start_render_pool() -> None:
+    RENDER_POOL.start(init_render_worker)
+
+
+@dataclass
+class RenderedImage:
+    data: bytes = field(repr=False)
+    filename: str
+    page: int
+    page_count: int
+    format: str = "png"
+    encode_ms: float = 0.0
+    path: str | None = None
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.data)
+
+
+def page_count(item_count: int, page_size: int = GALLERY_PAGE_SIZE) -> int:
+    return max(1, math.ceil(item_count / page_size))
 
 
 def combine_with_background(
@@ -33,8 +126,6 @@ def combine_with_background(
         fg = fg.resize((192, 192), Image.Resampling.LANCZOS)
         bg.paste(fg, (32, 12), fg)
 
-    draw = ImageDraw.Draw(bg)
-
     special_rarities = {
         "ICON SERIES",
         "DARK SERIES",
@@ -51,27 +142,9 @@ def combine_with_background(
     base_max_font_size = 80 if rarity.upper() in special_rarities else 40
 
     name = name.upper()
-    font_size = base_max_font_size
-    while font_size > 10:
-        try:
-            font = ImageFont.truetype(FONT_PATH, size=font_size)
-        except IOError:
-            font = ImageFont.load_default()
-            break
-        text_bbox = draw.textbbox((0, 0), name, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        if text_width <= bg.width - 20:
-            break
-        font_size -= 1
-
-    try:
-        font = ImageFont.truetype(FONT_PATH, size=font_size)
-    except IOError:
-        font = ImageFont.load_default()
-
-    text_bbox = draw.textbbox((0, 0), name, font=font)
-    text_width = text_bbox[2] - text_bbox[0]
-    text_height = text_bbox[3] - text_bbox[1]
+    font_size = fit_font_size((name,), bg.width - 20, base_max_font_size, 10)
+    font = get_font(font_size)
+    text_width, text_height = measure_text(name, font_size)
     text_x = (bg.width - text_width) // 2
 
     bar_y = int(bg.height * 0.80)
@@ -81,21 +154,26 @@ def combine_with_background(
     bg.paste(bar, (0, bar_y), bar)
 
     text_y = bar_y + (bar_height - text_height) // 2
+    draw = ImageDraw.Draw(bg)
     draw.text((text_x, text_y), name, fill="white", font=font)
 
     return bg
 
 
-def combine_images(
-    images,
-    username: str,
-    item_count: int,
-    logo_path: str,
-) -> Image.Image:
+def snap_tile_size(size: int, buckets: tuple[int, ...] = TILE_SIZE_BUCKETS) -> int:
+    """Largest bucket that fits in ``size``; ``size`` itself below the smallest one."""
+    return next((bucket for bucket in buckets if bucket <= size), size)
+
+
+def grid_layout(num_items: int) -> tuple[int, int, int]:
+    """Return (columns, rows, tile size) for a grid of num_items tiles.
+
+    The tile size is snapped to TILE_SIZE_BUCKETS, which shrinks the canvas
+    by a few pixels per column but lets every locker reuse the same tiles.
+    """
     max_width = 1848
     max_height = 2048
 
-    num_items = len(images)
     max_cols = 6
     num_rows = math.ceil(num_items / max_cols)
 
@@ -105,7 +183,24 @@ def combine_images(
 
     item_width = max_width // max_cols
     item_height = max_height // num_rows
-    image_size = min(item_width, item_height)
+    return max_cols, num_rows, snap_tile_size(min(item_width, item_height))
+
+
+def combine_images(
+    tiles: Iterable[tuple[tuple[int, int], bytes]],
+    username: str,
+    item_count: int,
+    logo_path: str,
+    total_items: int | None = None,
+    page_label: str | None = None,
+) -> Image.Image:
+    """Lay raw RGBA tiles out in the final grid and draw the footer.
+
+    Each tile is pasted as it is produced and dropped right after, so
+    memory stays bounded by the output canvas (itself capped by
+    grid_layout) rather than growing with the number of items.
+    """
+    max_cols, num_rows, image_size = grid_layout(item_count)
 
     total_width = max_cols * image_size
     total_height = num_rows * image_size
@@ -114,12 +209,14 @@ def combine_images(
 
     combined = Image.new("RGBA", (total_width, total_height), (0, 0, 0, 255))
 
-    for idx, img in enumerate(images):
+    for idx, (size, data) in enumerate(tiles):
+        img = Image.frombytes("RGBA", size, data)
         col = idx % max_cols
         row = idx // max_cols
         pos = (col * image_size, row * image_size)
-        resized = img.resize((image_size, image_size), Image.Resampling.LANCZOS)
-        combined.paste(resized, pos, resized)
+        if img.size != (image_size, image_size):
+            img = img.resize((image_size, image_size), Image.Resampling.LANCZOS)
+        combined.paste(img, pos, img)
 
     try:
         logo = Image.open(logo_path).convert("RGBA")
@@ -135,37 +232,20 @@ def combine_images(
 
     from datetime import datetime
 
-    text1 = f"Total items: {item_count}"
+    text1 = f"Total items: {total_items if total_items is not None else item_count}"
+    if page_label:
+        text1 = f"{text1} - {page_label}"
     text2 = f"Checked by {username} ({datetime.now().strftime('%d/%m/%y - %H:%M')})"
     text3 = f"discord.gg/{os.getenv('DISCORD_INVITE', '')}"
 
     draw = ImageDraw.Draw(combined)
-    font_size = logo_height // 3
-
-    try:
-        font = ImageFont.truetype(FONT_PATH, size=font_size)
-    except IOError:
-        font = ImageFont.load_default()
-
-    def measure(txt: str):
-        bbox = font.getbbox(txt)
-        return bbox[2] - bbox[0], bbox[3] - bbox[1]
-
-    w1, h1 = measure(text1)
-    w2, h2 = measure(text2)
-    w3, h3 = measure(text3)
-
     max_text_width = total_width - (logo_position[0] + logo_width + 20)
-    while (w1 > max_text_width or w2 > max_text_width or w3 > max_text_width) and font_size > 8:
-        font_size -= 1
-        try:
-            font = ImageFont.truetype(FONT_PATH, size=font_size)
-        except IOError:
-            font = ImageFont.load_default()
-            break
-        w1, h1 = measure(text1)
-        w2, h2 = measure(text2)
-        w3, h3 = measure(text3)
+    font_size = fit_font_size((text1, text2, text3), max_text_width, logo_height // 3, 8)
+    font = get_font(font_size)
+
+    w1, h1 = measure_text(text1, font_size)
+    w2, h2 = measure_text(text2, font_size)
+    w3, h3 = measure_text(text3, font_size)
 
     total_text_height = h1 + h2 + h3 + 10
     text_y_start = total_height - footer_height + (footer_height - total_text_height) // 2
@@ -178,33 +258,75 @@ def combine_images(
     return combined
 
 
-def _process_cosmetic_item(args: dict) -> Image.Image:
+def _process_cosmetic_item(args: dict) -> tuple[tuple[int, int], bytes]:
     cid = args["cid"]
     name = args["name"]
     rarity = args["rarity"]
     background_path = args["background_path"]
-    substitute_path = args.get("substitute_image_path")
+    cache_key = args.get("cache_key")
 
-    img_path = os.path.join(CACHE_DIR, f"{cid}.png")
+    if cache_key:
+        cached = load_tile(cache_key)
+        if cached is not None:
+            return cached.size, cached.tobytes()
 
-    try:
-        if substitute_path:
-            img = Image.open(substitute_path).convert("RGBA")
-        else:
-            img = Image.open(img_path).convert("RGBA")
+    img_path = os.path.join(CACHE_DIR, f"{cid.lower()}.png")
 
-        if img.size == (1, 1):
-            raise IOError("1x1 placeholder image")
-    except (UnidentifiedImageError, IOError):
-        img = Image.open(PLACEHOLDER_IMAGE).convert("RGBA")
+    background = _load_background(background_path)
+    is_banner = cid.lower().startswith("banner_")
 
-    try:
-        background = Image.open(background_path).convert("RGBA")
-    except (UnidentifiedImageError, IOError):
-        background = Image.new("RGBA", (512, 512), (0, 0, 0, 0))
+    # Icons come pre-scaled to the size they are drawn at, so
+    # combine_with_background's resize is a no-op copy.
+    icon_size = 192 if is_banner else background.width
+    img = load_icon(img_path, icon_size) or load_icon(PLACEHOLDER_IMAGE, icon_size)
+    if img is None:
+        # Placeholder is missing or unreadable too: return an empty tile
+        # (not cached) rather than raising inside the render pool.
+        print(f"[DEBUG] No icon or placeholder for {cid}, drawing a blank tile")
+        size = args.get("tile_size") or background.width
+        blank = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+        return blank.size, blank.tobytes()
+
+    tile = combine_with_background(img, background, name, rarity, is_banner=is_banner)
+    tile_size = args.get("tile_size")
+    if tile_size and tile.size != (tile_size, tile_size):
+        tile = tile.resize((tile_size, tile_size), Image.Resampling.LANCZOS)
+    if cache_key:
+        store_tile(cache_key, tile)
+    # Raw RGBA bytes pickle far cheaper than an Image object on the way back.
+    return tile.size, tile.tobytes()
+
+
+def tile_args(cosmetic: dict, tile_size: int | None) -> dict:
+    """Build the render-pool job for one cosmetic info dict."""
+    rarity = cosmetic.get("rarity", "Common")
+    background_path = RARITY_BACKGROUNDS_V1.get(rarity, RARITY_BACKGROUNDS_V1["Common"])
+    icon_path = os.path.join(CACHE_DIR, f"{cosmetic['id'].lower()}.png")
+    return {
+        "cid": cosmetic["id"],
+        "name": cosmetic["name"],
+        "rarity": rarity,
+        "background_path": background_path,
+        "tile_size": tile_size,
+        "cache_key": tile_key(
+            cosmetic["id"], rarity, cosmetic["name"], tile_size,
+            icon_path, background_path, FONT_PATH,
+        ),
+    }
 
-    is_banner = cid.lower().startswith("banner_")
-    return combine_with_background(img, background, name, rarity, is_banner=is_banner)
+
+async def render_tiles(work_args: list[dict]) -> list[tuple[tuple[int, int], bytes]]:
+    """Return raw RGBA tiles, rendering only what the memory cache lacks."""
+    tiles = [TILE_MEMORY_CACHE.get(args["cache_key"]) for args in work_args]
+    missing = [idx for idx, tile in enumerate(tiles) if tile is None]
+    if missing:
+        start_render_pool()
+        rendered = await RENDER_POOL.map(_process_cosmetic_item, [work_args[idx] for idx in missing])
+        for idx, (size, data) in zip(missing, rendered):
+            TILE_MEMORY_CACHE.put(work_args[idx]["cache_key"], size, data)
+            tiles[idx] = (size, data)
+    print(f"[DEBUG] {len(tiles) - len(missing)}/{len(tiles)} tiles served from memory cache.")
+    return tiles
 
 
 async def create_checker_image(
@@ -212,57 +334,68 @@ async def create_checker_image(
     session,
     username: str,
     group_name: str,
-    output_dir: str = "output",
+    output_dir: str | None = None,
     footer_text: str = "Generated by Fortnite Locker Checker",
-) -> str | None:
-    os.makedirs(output_dir, exist_ok=True)
-
+    page: int = 0,
+    page_size: int = GALLERY_PAGE_SIZE,
+) -> RenderedImage | None:
+    """Render one page of ``ids`` (already sorted) as a gallery image.
+
+    Metadata is resolved for every id so the page count is exact, but only
+    the icons on the requested page are downloaded and rendered. The image is
+    returned in memory; it is only written to disk when ``output_dir`` is set.
+    """
     if not ids:
         return None
 
-    await download_cosmetic_images(ids, session)
-    info_list = await asyncio.gather(*[get_cosmetic_info(cid, session) for cid in ids])
+    info_list = await get_cosmetic_infos(ids, session)
 
-    valid_info = [c for c in info_list if c["name"].strip().lower() != "unknown"]
-    if not valid_info:
+    all_valid = [c for c in info_list if c["name"].strip().lower() != "unknown"]
+    pages = page_count(len(all_valid), page_size)
+    if not all_valid or not 0 <= page < pages:
         return None
 
-    work_args = []
-    for cosmetic in valid_info:
-        rarity = cosmetic.get("rarity", "Common")
-        background_path = RARITY_BACKGROUNDS_V1.get(rarity, RARITY_BACKGROUNDS_V1["Common"])
-        work_args.append(
-            {
-                "cid": cosmetic["id"],
-                "name": cosmetic["name"],
-                "rarity": rarity,
-                "background_path": background_path,
-                "substitute_image_path": None, 
-            }
-        )
-
-    images = []
-    with ProcessPoolExecutor(max_workers=4) as executor:
-        for final_img in executor.map(_process_cosmetic_item, work_args):
-            images.append(final_img)
-
-    if not images:
-        return None
+    valid_info = all_valid[page * page_size:(page + 1) * page_size]
+    await download_cosmetic_images([c["id"] for c in valid_info], session)
 
-    logo_path = os.path.join(output_dir, "logo.png")
-    if not os.path.exists(logo_path):
-        root_logo = os.path.join(os.path.dirname(__file__), "logo.png")
-        if os.path.exists(root_logo):
-            from shutil import copyfile
-            copyfile(root_logo, logo_path)
+    # Tiles are rendered straight at their final grid size, so the workers
+    # ship back small buffers and the compositor never resizes.
+    _, _, tile_size = grid_layout(len(valid_info))
+
+    tiles = await render_tiles([tile_args(cosmetic, tile_size) for cosmetic in valid_info])
 
     final_image = combine_images(
-        images,
+        tiles,
         username=username,
         item_count=len(valid_info),
-        logo_path=logo_path,
+        logo_path=LOGO_IMAGE,
+        total_items=len(all_valid),
+        page_label=f"Page {page + 1}/{pages}" if pages > 1 else None,
+    )
+
+    base_name = group_name.replace(' ', '_').lower()
+    if pages > 1:
+        base_name = f"{base_name}_{page + 1}"
+    encoded = await asyncio.to_thread(encode_image, final_image)
+    print(
+        f"[DEBUG] Encoded {group_name} page {page + 1} as {encoded.format}: "
+        f"{encoded.size / 1024:.0f} KiB in {encoded.encode_ms:.0f} ms"
     )
 
-    output_path = os.path.join(output_dir, f"{group_name.replace(' ', '_').lower()}.png")
-    final_image.save(output_path, "PNG")
-    return output_path
+    filename = f"{base_name}.{encoded.extension}"
+    output_path = None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, filename)
+        with open(output_path, "wb") as f:
+            f.write(encoded.data)
+
+    return RenderedImage(
+        data=encoded.data,
+        filename=filename,
+        page=page,
+        page_count=pages,
+        format=encoded.format,
+        encode_ms=encoded.encode_ms,
+        path=output_path,
+    )
@@ -0,0 +1,127 @@
+import asyncio
+import itertools
+import os
+from typing import Any, Awaitable, Callable
+
+from src.config import PRERENDER_CONCURRENCY, PRERENDER_RETRY_SECONDS
+from src.render_pool import RENDER_POOL
+from src.singleflight import SingleFlight
+
+# Most likely to be opened first after "Account informations".
+CATEGORY_PRIORITY = ["Skins", "Emotes", "Pickaxes", "Back Blings", "Gliders", "Banners", "All Cosmetics"]
+
+
+def cpu_saturated() -> bool:
+    if RENDER_POOL.saturated:
+        return True
+    if hasattr(os, "getloadavg"):
+        return os.getloadavg()[0] >= (os.cpu_count() or 1)
+    return False
+
+
+class PrerenderScheduler:
+    """Speculatively renders every category right after login.
+
+    Jobs run in global priority order (every user's Skins before anyone's
+    Gliders). A click for a category that is already rendering awaits the
+    running job instead of starting a second one. Queued work is dropped
+    when the session ends and put back after ``retry_delay`` seconds while
+    the render pool is saturated.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[int, str], Awaitable[Any]],
+        concurrency: int = PRERENDER_CONCURRENCY,
+        retry_delay: float = PRERENDER_RETRY_SECONDS,
+    ) -> None:
+        self._render = render
+        self.concurrency = concurrency
+        self.retry_delay = retry_delay
+        self._queue: asyncio.PriorityQueue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._renders = SingleFlight()
+        # A user's queued jobs stay valid only while their token is current.
+        self._tokens: dict[int, object] = {}
+        # Jobs still queued or deferred per user; the token goes with the last one,
+        # so nothing is left behind for sessions whose end we never hear about.
+        self._queued: dict[int, int] = {}
+        self._seq = itertools.count()
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def schedule(self, user_id: int, categories: list[str]) -> None:
+        token = self._tokens.setdefault(user_id, object())
+        self._queued[user_id] = self._queued.get(user_id, 0) + len(categories)
+        for category in categories:
+            rank = CATEGORY_PRIORITY.index(category) if category in CATEGORY_PRIORITY else len(CATEGORY_PRIORITY)
+            self._queue.put_nowait((rank, next(self._seq), user_id, token, category))
+
+    def drop_queued(self, user_id: int) -> None:
+        """Forget a user's queued work; renders already running finish."""
+        self._tokens.pop(user_id, None)
+
+    def cancel(self, user_id: int) -> None:
+        """Forget queued work for a user and stop anything still running."""
+        self.drop_queued(user_id)
+        self._renders.cancel_where(lambda key: key[0] == user_id)
+
+    async def run(self, user_id: int, category: str, page: int, render: Callable[[], Awaitable[Any]]) -> Any:
+        """Render on demand, joining the in-flight job for the same page if any.
+
+        Returns None if the shared render was cancelled because the session
+        ended, so the caller can still answer its interaction.
+        """
+        try:
+            return await self._renders.do((user_id, category, page), render)
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if current is not None and current.cancelling():
+                raise
+            return None
+
+    def _requeue(self, job: tuple) -> None:
+        if self._workers:
+            self._queue.put_nowait(job)
+
+    def _finish(self, user_id: int) -> None:
+        left = self._queued.get(user_id, 0) - 1
+        if left > 0:
+            self._queued[user_id] = left
+        else:
+            self._queued.pop(user_id, None)
+            self._tokens.pop(user_id, None)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            _, _, user_id, token, category = job
+            deferred = False
+            try:
+                if self._tokens.get(user_id) is not token:
+                    continue
+                if (user_id, category, 0) in self._renders:
+                    continue
+                if cpu_saturated():
+                    print(f"[DEBUG] Deferring speculative {category} render for {user_id}: CPU saturated.")
+                    asyncio.get_running_loop().call_later(self.retry_delay, self._requeue, job)
+                    deferred = True
+                    continue
+                task = self._renders.start((user_id, category, 0), lambda: self._render(user_id, category))
+                await asyncio.wait([task])
+                if not task.cancelled() and task.exception() is not None:
+                    print(f"Failed to generate {category}: {task.exception()}")
+            finally:
+                if not deferred:
+                    self._finish(user_id)
+                self._queue.task_done()
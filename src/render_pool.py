@@ -0,0 +1,68 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable
+
+from src.config import RENDER_WORKERS, RENDER_QUEUE_SIZE
+
+
+class RenderPool:
+    """Long-lived process pool shared by every render.
+
+    At most ``queue_size`` jobs are in flight at once, and each ``map`` call
+    only feeds the pool through ``workers`` slots of its own, so a huge
+    locker cannot starve a small one that arrives after it.
+    """
+
+    def __init__(self, workers: int = RENDER_WORKERS, queue_size: int = RENDER_QUEUE_SIZE) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self.pending_jobs = 0
+
+    def start(self, initializer: Callable[[], None] | None = None) -> None:
+        if self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=initializer)
+        self._slots = asyncio.Semaphore(self.queue_size)
+        print(f"[DEBUG] Render pool started with {self.workers} workers.")
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._slots = None
+
+    async def map(self, fn: Callable[[Any], Any], args: Iterable[Any]) -> list[Any]:
+        """Run ``fn`` over ``args`` in the pool, returning results in order."""
+        if self._executor is None:
+            raise RuntimeError("RenderPool.start() must be called before map()")
+
+        loop = asyncio.get_running_loop()
+        jobs = list(enumerate(args))
+        results: list[Any] = [None] * len(jobs)
+        pending = iter(jobs)
+        self.pending_jobs += len(jobs)
+
+        async def feeder():
+            for idx, arg in pending:
+                try:
+                    async with self._slots:
+                        results[idx] = await loop.run_in_executor(self._executor, fn, arg)
+                finally:
+                    self.pending_jobs -= 1
+
+        try:
+            await asyncio.gather(*[feeder() for _ in range(min(self.workers, len(jobs)))])
+        finally:
+            # Jobs never picked up because a feeder failed or was cancelled.
+            self.pending_jobs -= sum(1 for _ in pending)
+        return results
+
+    @property
+    def saturated(self) -> bool:
+        """True while more tiles are queued than the pool has slots for."""
+        return self.pending_jobs >= self.queue_size
+
+
+RENDER_POOL = RenderPool()
@@ -0,0 +1,768 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping, MutableMapping
+from dataclasses import fields
+from typing import Callable, Iterator
+from urllib.parse import urlparse
+
+from src.config import (
+    SESSION_BACKEND,
+    SESSION_SQLITE_PATH,
+    REDIS_URL,
+    SESSION_MAX_ENTRIES,
+    SESSION_IDLE_TTL_SECONDS,
+    SESSION_COMPACT_ITEMS,
+)
+from src.epic_auth import EpicUser
+from src.image_utils import RenderedImage
+
+# Process-wide intern table: every cosmetic id string is stored once and
+# sessions only keep 4-byte indexes into it.
+_ID_TABLE: list[str] = []
+_ID_INDEX: dict[str, int] = {}
+_ID_LOCK = threading.Lock()
+
+
+def _intern_id(cosmetic_id: str) -> int:
+    idx = _ID_INDEX.get(cosmetic_id)
+    if idx is None:
+        with _ID_LOCK:
+            idx = _ID_INDEX.get(cosmetic_id)
+            if idx is None:
+                idx = len(_ID_TABLE)
+                _ID_TABLE.append(cosmetic_id)
+                _ID_INDEX[cosmetic_id] = idx
+    return idx
+
+
+class CompactItems(Mapping):
+    """Read-only category -> [cosmetic id] map backed by interned id arrays."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, items: Mapping[str, list[str]]) -> None:
+        self._data = {
+            category: array("I", (_intern_id(cid) for cid in ids))
+            for category, ids in items.items()
+        }
+
+    def __getitem__(self, category: str) -> list[str]:
+        return [_ID_TABLE[idx] for idx in self._data[category]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def count(self, category: str) -> int:
+        return len(self._data.get(category, ()))
+
+
+class CompactTemplates(MutableMapping):
+    """Locker item guid -> templateId map that keeps each templateId interned.
+
+    Every account owning a cosmetic repeats the same templateId string, so
+    only the guids stay per session.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, items: Mapping[str, str] = ()) -> None:
+        self._data: dict[str, int] = {}
+        self.update(items)
+
+    def __getitem__(self, guid: str) -> str:
+        return _ID_TABLE[self._data[guid]]
+
+    def __setitem__(self, guid: str, template_id: str) -> None:
+        self._data[guid] = _intern_id(template_id)
+
+    def __delitem__(self, guid: str) -> None:
+        del self._data[guid]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def compact_locker(locker: dict | None) -> dict | None:
+    if locker and not isinstance(locker.get("items"), CompactTemplates):
+        locker = {**locker, "items": CompactTemplates(locker.get("items", {}))}
+    return locker
+
+
+# Per-process caches that are cheap to rebuild and would go stale if
+# another process wrote them back after a locker refresh.
+_LOCAL_FIELDS = ("sorted_ids",)
+
+# field -> (encode, decode) for values that are not plain JSON.
+_FIELD_CODECS: dict[str, tuple[Callable, Callable]] = {
+    "items": (lambda items: {category: list(ids) for category, ids in items.items()}, lambda raw: raw),
+    "epic_user": (lambda user: user.raw, EpicUser.from_dict),
+    "current": (lambda current: list(current) if current else None, lambda raw: tuple(raw) if raw else None),
+    "locker": (lambda locker: {**locker, "items": dict(locker["items"])} if locker else locker, compact_locker),
+}
+
+
+def encode_fields(data: Mapping) -> dict:
+    """JSON-ready copy of the session fields in ``data`` (all of them or a partial update)."""
+    encoded = {}
+    for name, value in data.items():
+        if name in _LOCAL_FIELDS:
+            continue
+        codec = _FIELD_CODECS.get(name)
+        encoded[name] = codec[0](value) if codec else value
+    return encoded
+
+
+def decode_fields(raw: Mapping) -> dict:
+    data = {}
+    for name, value in raw.items():
+        codec = _FIELD_CODECS.get(name)
+        data[name] = codec[1](value) if codec else value
+    data["sorted_ids"] = {}
+    return data
+
+
+def serialize_session(data: dict) -> str:
+    """Encode a session dict as JSON so any process can pick it up.
+
+    Rendered images are not part of the session; stores keep them under
+    their own keys (see ``SessionStore.put_image``).
+    """
+    return json.dumps(encode_fields(data))
+
+
+def deserialize_session(payload: str | bytes) -> dict:
+    return decode_fields(json.loads(payload))
+
+
+def pack_image(image: RenderedImage) -> bytes:
+    """One rendered page as a JSON header line followed by the raw file bytes."""
+    header = {f.name: getattr(image, f.name) for f in fields(image) if f.name != "data"}
+    return json.dumps(header).encode() + b"\n" + image.data
+
+
+def unpack_image(blob: bytes) -> RenderedImage:
+    header, _, data = bytes(blob).partition(b"\n")
+    return RenderedImage(data=data, **json.loads(header))
+
+
+class SessionStore(ABC):
+    """Where logged-in sessions live, keyed by Discord user id.
+
+    A session is written whole only by ``set()`` at login. Handlers then
+    write back just the fields they changed with ``update()``, and rendered
+    pages with ``put_image()``, so concurrent handlers (or processes) never
+    overwrite each other's changes and nothing recreates a session after it
+    ended. ``on_evict(user_id, data)`` runs for sessions dropped by expiry or
+    the size cap.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SESSION_MAX_ENTRIES,
+        idle_ttl: float = SESSION_IDLE_TTL_SECONDS,
+        on_evict: Callable[[int, dict], None] | None = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # user id -> (session version, sorted_ids) for stores that decode a
+        # fresh dict on every get(), so a locker is sorted once per version.
+        self._sorted: OrderedDict[int, tuple[int | None, dict]] = OrderedDict()
+
+    def _attach_sorted(self, user_id: int, data: dict) -> dict:
+        """Give a decoded session this process's sorted_ids for its version."""
+        version = data.get("version")
+        cached = self._sorted.get(user_id)
+        if cached is None or cached[0] != version:
+            cached = (version, {})
+            self._sorted[user_id] = cached
+        self._sorted.move_to_end(user_id)
+        while len(self._sorted) > self.max_entries:
+            self._sorted.popitem(last=False)
+        data["sorted_ids"] = cached[1]
+        return data
+
+    def _evict(self, user_id: int, data: dict) -> None:
+        self.evictions += 1
+        if self.on_evict is not None:
+            try:
+                self.on_evict(user_id, data)
+            except Exception as e:
+                print(f"Error cleaning up evicted session {user_id}: {e}")
+
+    @abstractmethod
+    async def get(self, user_id: int) -> dict | None: ...
+
+    @abstractmethod
+    async def set(self, user_id: int, data: dict) -> None:
+        """Create or replace a whole session, dropping its rendered images."""
+
+    @abstractmethod
+    async def update(self, user_id: int, changes: dict, stale_categories: Iterable[str] = ()) -> bool:
+        """Merge ``changes`` into an existing session and drop the images of
+        ``stale_categories``, atomically. Returns False if the session is gone."""
+
+    @abstractmethod
+    async def pop(self, user_id: int) -> dict | None: ...
+
+    @abstractmethod
+    async def get_image(self, user_id: int, category: str, page: int) -> RenderedImage | None: ...
+
+    @abstractmethod
+    async def put_image(
+        self, user_id: int, category: str, page: int, image: RenderedImage, version: int
+    ) -> bool:
+        """Keep a rendered page, unless the session is gone or its ``version``
+        moved on while rendering (the locker was refreshed)."""
+
+    async def sweep(self) -> int:
+        """Drop every session idle for longer than the TTL."""
+        return 0
+
+    async def close(self) -> None:
+        pass
+
+    @property
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class MemorySessionStore(SessionStore):
+    """Bounded LRU of sessions held in this process, with an idle TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = SESSION_MAX_ENTRIES,
+        idle_ttl: float = SESSION_IDLE_TTL_SECONDS,
+        on_evict: Callable[[int, dict], None] | None = None,
+        compact_items: bool = SESSION_COMPACT_ITEMS,
+    ) -> None:
+        super().__init__(max_entries, idle_ttl, on_evict)
+        self.compact_items = compact_items
+        self._entries: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+        self._images: dict[int, dict[tuple[str, int], RenderedImage]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _compact(self, data: dict) -> None:
+        if not self.compact_items:
+            return
+        if "items" in data and not isinstance(data["items"], CompactItems):
+            data["items"] = CompactItems(data["items"])
+        if "locker" in data:
+            data["locker"] = compact_locker(data["locker"])
+
+    def _drop(self, user_id: int) -> dict:
+        _, data = self._entries.pop(user_id)
+        self._images.pop(user_id, None)
+        return data
+
+    async def get(self, user_id: int) -> dict | None:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        last_used, data = entry
+        now = time.monotonic()
+        if now - last_used > self.idle_ttl:
+            self._evict(user_id, self._drop(user_id))
+            self.misses += 1
+            return None
+
+        self._entries[user_id] = (now, data)
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return data
+
+    async def set(self, user_id: int, data: dict) -> None:
+        self._compact(data)
+        self._entries[user_id] = (time.monotonic(), data)
+        self._entries.move_to_end(user_id)
+        self._images.pop(user_id, None)
+        while len(self._entries) > self.max_entries:
+            old_id = next(iter(self._entries))
+            self._evict(old_id, self._drop(old_id))
+
+    async def update(self, user_id: int, changes: dict, stale_categories: Iterable[str] = ()) -> bool:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return False
+        self._compact(changes)
+        entry[1].update(changes)
+        stale = set(stale_categories)
+        images = self._images.get(user_id)
+        if images and stale:
+            self._images[user_id] = {key: image for key, image in images.items() if key[0] not in stale}
+        return True
+
+    async def pop(self, user_id: int) -> dict | None:
+        return self._drop(user_id) if user_id in self._entries else None
+
+    async def get_image(self, user_id: int, category: str, page: int) -> RenderedImage | None:
+        return self._images.get(user_id, {}).get((category, page))
+
+    async def put_image(
+        self, user_id: int, category: str, page: int, image: RenderedImage, version: int
+    ) -> bool:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1].get("version") != version:
+            return False
+        self._images.setdefault(user_id, {})[(category, page)] = image
+        return True
+
+    async def sweep(self) -> int:
+        cutoff = time.monotonic() - self.idle_ttl
+        expired = []
+        # Entries are kept in least-recently-used order.
+        for user_id, (last_used, _) in self._entries.items():
+            if last_used >= cutoff:
+                break
+            expired.append(user_id)
+        for user_id in expired:
+            self._evict(user_id, self._drop(user_id))
+        return len(expired)
+
+    @property
+    def stats(self) -> dict:
+        return {"size": len(self._entries), **super().stats}
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used);
+CREATE TABLE IF NOT EXISTS session_images (
+    user_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    image BLOB NOT NULL,
+    PRIMARY KEY (user_id, category, page)
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a SQLite file that every bot process on the host can open.
+
+    Read-modify-write operations run in ``BEGIN IMMEDIATE`` transactions, so
+    they are atomic across processes too.
+    """
+
+    def __init__(
+        self,
+        path: str = SESSION_SQLITE_PATH,
+        max_entries: int = SESSION_MAX_ENTRIES,
+        idle_ttl: float = SESSION_IDLE_TTL_SECONDS,
+        on_evict: Callable[[int, dict], None] | None = None,
+    ) -> None:
+        super().__init__(max_entries, idle_ttl, on_evict)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SQLITE_SCHEMA)
+        self._lock = threading.Lock()
+
+    def _delete(self, user_ids: list[int]) -> None:
+        params = [(uid,) for uid in user_ids]
+        self._conn.executemany("DELETE FROM session_images WHERE user_id = ?", params)
+        self._conn.executemany("DELETE FROM sessions WHERE user_id = ?", params)
+
+    def _get(self, user_id: int) -> tuple[float, str] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_used, data FROM sessions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if row is not None and time.time() - row[0] <= self.idle_ttl:
+                with self._conn:
+                    self._conn.execute(
+                        "UPDATE sessions SET last_used = ? WHERE user_id = ?", (time.time(), user_id)
+                    )
+        return row
+
+    async def get(self, user_id: int) -> dict | None:
+        row = await asyncio.to_thread(self._get, user_id)
+        if row is None:
+            self.misses += 1
+            return None
+        last_used, payload = row
+        if time.time() - last_used > self.idle_ttl:
+            await self.pop(user_id)
+            self._evict(user_id, deserialize_session(payload))
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._attach_sorted(user_id, deserialize_session(payload))
+
+    def _set(self, user_id: int, payload: str) -> list[tuple[int, str]]:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM session_images WHERE user_id = ?", (user_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (user_id, data, last_used) VALUES (?, ?, ?)",
+                (user_id, payload, time.time()),
+            )
+            overflow = self._conn.execute(
+                "SELECT user_id, data FROM sessions ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+                (self.max_entries,),
+            ).fetchall()
+            self._delete([uid for uid, _ in overflow])
+        return overflow
+
+    async def set(self, user_id: int, data: dict) -> None:
+        self._sorted.pop(user_id, None)
+        overflow = await asyncio.to_thread(self._set, user_id, serialize_session(data))
+        for old_id, payload in overflow:
+            self._evict(old_id, deserialize_session(payload))
+
+    def _update(self, user_id: int, changes: dict, stale: list[str]) -> bool:
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT data FROM sessions WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None:
+                return False
+            raw = json.loads(row[0])
+            raw.update(changes)
+            self._conn.execute(
+                "UPDATE sessions SET data = ?, last_used = ? WHERE user_id = ?",
+                (json.dumps(raw), time.time(), user_id),
+            )
+            self._conn.executemany(
+                "DELETE FROM session_images WHERE user_id = ? AND category = ?",
+                [(user_id, category) for category in stale],
+            )
+        return True
+
+    async def update(self, user_id: int, changes: dict, stale_categories: Iterable[str] = ()) -> bool:
+        return await asyncio.to_thread(self._update, user_id, encode_fields(changes), list(stale_categories))
+
+    def _pop(self, user_id: int) -> str | None:
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT data FROM sessions WHERE user_id = ?", (user_id,)).fetchone()
+            self._delete([user_id])
+        return row[0] if row else None
+
+    async def pop(self, user_id: int) -> dict | None:
+        self._sorted.pop(user_id, None)
+        payload = await asyncio.to_thread(self._pop, user_id)
+        return deserialize_session(payload) if payload else None
+
+    def _get_image(self, user_id: int, category: str, page: int) -> bytes | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT image FROM session_images WHERE user_id = ? AND category = ? AND page = ?",
+                (user_id, category, page),
+            ).fetchone()
+        return row[0] if row else None
+
+    async def get_image(self, user_id: int, category: str, page: int) -> RenderedImage | None:
+        blob = await asyncio.to_thread(self._get_image, user_id, category, page)
+        return unpack_image(blob) if blob is not None else None
+
+    def _put_image(self, user_id: int, category: str, page: int, blob: bytes, version: int) -> bool:
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT json_extract(data, '$.version') FROM sessions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if row is None or row[0] != version:
+                return False
+            self._conn.execute(
+                "INSERT OR REPLACE INTO session_images (user_id, category, page, image) VALUES (?, ?, ?, ?)",
+                (user_id, category, page, blob),
+            )
+        return True
+
+    async def put_image(
+        self, user_id: int, category: str, page: int, image: RenderedImage, version: int
+    ) -> bool:
+        return await asyncio.to_thread(self._put_image, user_id, category, page, pack_image(image), version)
+
+    def _sweep(self) -> list[tuple[int, str]]:
+        cutoff = time.time() - self.idle_ttl
+        with self._lock, self._conn:
+            expired = self._conn.execute(
+                "SELECT user_id, data FROM sessions WHERE last_used < ?", (cutoff,)
+            ).fetchall()
+            self._delete([uid for uid, _ in expired])
+        return expired
+
+    async def sweep(self) -> int:
+        expired = await asyncio.to_thread(self._sweep)
+        for user_id, payload in expired:
+            self._evict(user_id, deserialize_session(payload))
+        return len(expired)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RedisError(Exception):
+    pass
+
+
+# KEYS: session hash, images hash, last-used index. ARGV: user id, now, idle ttl, key ttl.
+_REDIS_GET = """
+local last = redis.call('ZSCORE', KEYS[3], ARGV[1])
+if not last or tonumber(ARGV[2]) - tonumber(last) > tonumber(ARGV[3]) then return nil end
+local fields = redis.call('HGETALL', KEYS[1])
+if #fields == 0 then return nil end
+redis.call('ZADD', KEYS[3], ARGV[2], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return fields
+"""
+
+# KEYS: session hash, images hash, last-used index. ARGV: user id, now, key ttl, field/value pairs...
+_REDIS_SET = """
+redis.call('DEL', KEYS[1], KEYS[2])
+redis.call('HSET', KEYS[1], unpack(ARGV, 4))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('ZADD', KEYS[3], ARGV[2], ARGV[1])
+return 1
+"""
+
+# KEYS: session hash, images hash, last-used index.
+# ARGV: user id, now, key ttl, stale category count, stale categories..., field/value pairs...
+_REDIS_UPDATE = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+local stale_count = tonumber(ARGV[4])
+if stale_count > 0 then
+    local stale = {}
+    for i = 5, 4 + stale_count do stale[ARGV[i]] = true end
+    for _, field in ipairs(redis.call('HKEYS', KEYS[2])) do
+        if stale[string.match(field, '^(.*)|%d+$')] then redis.call('HDEL', KEYS[2], field) end
+    end
+end
+if #ARGV > 4 + stale_count then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 5 + stale_count))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('ZADD', KEYS[3], ARGV[2], ARGV[1])
+return 1
+"""
+
+# KEYS: session hash, images hash. ARGV: encoded version, image field, packed image.
+_REDIS_PUT_IMAGE = """
+if redis.call('HGET', KEYS[1], 'version') ~= ARGV[1] then return 0 end
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+local ttl = redis.call('TTL', KEYS[1])
+if ttl > 0 then redis.call('EXPIRE', KEYS[2], ttl) end
+return 1
+"""
+
+# KEYS: session hash, images hash, last-used index. ARGV: user id, idle cutoff (or '+inf').
+_REDIS_POP = """
+local last = redis.call('ZSCORE', KEYS[3], ARGV[1])
+if ARGV[2] ~= '+inf' and last and tonumber(last) >= tonumber(ARGV[2]) then return nil end
+local fields = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1], KEYS[2])
+redis.call('ZREM', KEYS[3], ARGV[1])
+return fields
+"""
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions in Redis (or anything speaking RESP), shared across hosts.
+
+    Each session is a hash with one JSON value per field, so ``update()``
+    only rewrites the fields it was given; rendered pages live in a second
+    hash. A sorted set of last-use times lets ``sweep()`` evict idle
+    sessions (and run ``on_evict``) from whichever process sweeps first.
+    Keys also carry a Redis TTL of twice the idle TTL as a safety net for
+    when no bot is running. ``max_entries`` is not enforced here; size the
+    server with a ``maxmemory`` policy instead.
+    """
+
+    def __init__(
+        self,
+        url: str = REDIS_URL,
+        idle_ttl: float = SESSION_IDLE_TTL_SECONDS,
+        on_evict: Callable[[int, dict], None] | None = None,
+        prefix: str = "fortnite-checker:session:",
+    ) -> None:
+        super().__init__(idle_ttl=idle_ttl, on_evict=on_evict)
+        self.url = urlparse(url)
+        self.prefix = prefix
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._lock = asyncio.Lock()
+
+    def _keys(self, user_id: int) -> tuple[str, str, str]:
+        return f"{self.prefix}{user_id}", f"{self.prefix}{user_id}:images", f"{self.prefix}index"
+
+    @property
+    def _key_ttl(self) -> str:
+        return str(max(1, int(self.idle_ttl * 2)))
+
+    @staticmethod
+    def _image_field(category: str, page: int) -> str:
+        return f"{category}|{page}"
+
+    @staticmethod
+    def _pairs(changes: dict) -> list[str]:
+        return [part for name, value in encode_fields(changes).items() for part in (name, json.dumps(value))]
+
+    @staticmethod
+    def _decode_hash(reply: list | None) -> dict | None:
+        if not reply:
+            return None
+        return decode_fields({
+            reply[i].decode(): json.loads(reply[i + 1]) for i in range(0, len(reply), 2)
+        })
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(
+            self.url.hostname or "localhost", self.url.port or 6379
+        )
+        if self.url.password:
+            if self.url.username:
+                await self._send("AUTH", self.url.username, self.url.password)
+            else:
+                await self._send("AUTH", self.url.password)
+        db = (self.url.path or "/0").lstrip("/") or "0"
+        if db != "0":
+            await self._send("SELECT", db)
+
+    async def _send(self, *args: str | bytes) -> object:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            value = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(value), value))
+        self._writer.write(b"".join(parts))
+        await self._writer.drain()
+        return await self._read_reply()
+
+    async def _read_reply(self) -> object:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise RedisError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(body)
+            if count < 0:
+                return None
+            return [await self._read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def command(self, *args: str | bytes) -> object:
+        async with self._lock:
+            if self._writer is None or self._writer.is_closing():
+                await self._connect()
+            try:
+                return await self._send(*args)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # One reconnect attempt covers server restarts and idle timeouts.
+                await self._connect()
+                return await self._send(*args)
+
+    async def _eval(self, script: str, keys: tuple[str, ...], *args: str | bytes) -> object:
+        return await self.command("EVAL", script, str(len(keys)), *keys, *args)
+
+    async def get(self, user_id: int) -> dict | None:
+        reply = await self._eval(
+            _REDIS_GET, self._keys(user_id), str(user_id), repr(time.time()), str(self.idle_ttl), self._key_ttl
+        )
+        data = self._decode_hash(reply)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._attach_sorted(user_id, data)
+
+    async def set(self, user_id: int, data: dict) -> None:
+        self._sorted.pop(user_id, None)
+        await self._eval(
+            _REDIS_SET, self._keys(user_id), str(user_id), repr(time.time()), self._key_ttl, *self._pairs(data)
+        )
+
+    async def update(self, user_id: int, changes: dict, stale_categories: Iterable[str] = ()) -> bool:
+        stale = list(stale_categories)
+        updated = await self._eval(
+            _REDIS_UPDATE, self._keys(user_id), str(user_id), repr(time.time()), self._key_ttl,
+            str(len(stale)), *stale, *self._pairs(changes),
+        )
+        return updated == 1
+
+    async def pop(self, user_id: int) -> dict | None:
+        self._sorted.pop(user_id, None)
+        return self._decode_hash(await self._eval(_REDIS_POP, self._keys(user_id), str(user_id), "+inf"))
+
+    async def get_image(self, user_id: int, category: str, page: int) -> RenderedImage | None:
+        blob = await self.command("HGET", self._keys(user_id)[1], self._image_field(category, page))
+        return unpack_image(blob) if blob is not None else None
+
+    async def put_image(
+        self, user_id: int, category: str, page: int, image: RenderedImage, version: int
+    ) -> bool:
+        stored = await self._eval(
+            _REDIS_PUT_IMAGE, self._keys(user_id)[:2],
+            json.dumps(version), self._image_field(category, page), pack_image(image),
+        )
+        return stored == 1
+
+    async def sweep(self) -> int:
+        cutoff = repr(time.time() - self.idle_ttl)
+        index = self._keys(0)[2]
+        idle = await self.command("ZRANGEBYSCORE", index, "-inf", f"({cutoff}")
+        expired = 0
+        for raw_id in idle or []:
+            user_id = int(raw_id)
+            # Re-checked inside the script: the session may have been used since.
+            reply = await self._eval(_REDIS_POP, self._keys(user_id), str(user_id), cutoff)
+            data = self._decode_hash(reply)
+            if data is not None:
+                self._evict(user_id, data)
+                expired += 1
+        return expired
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+
+def create_session_store(
+    backend: str = SESSION_BACKEND,
+    on_evict: Callable[[int, dict], None] | None = None,
+) -> SessionStore:
+    if backend == "memory":
+        return MemorySessionStore(on_evict=on_evict)
+    if backend == "sqlite":
+        return SQLiteSessionStore(on_evict=on_evict)
+    if backend == "redis":
+        return RedisSessionStore(on_evict=on_evict)
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
@@ -0,0 +1,42 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one shared task.
+
+    The first caller for a key starts ``fn()``; everyone arriving while it is
+    still running awaits the same result (or exception). A waiter that gets
+    cancelled does not cancel the shared task for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Task] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Return the running task for ``key``, starting ``fn()`` if there is none."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return task
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        return await asyncio.shield(self.start(key, fn))
+
+    def cancel_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        tasks = [task for key, task in self._calls.items() if predicate(key)]
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, UnidentifiedImageError
+
+from src.config import TILE_CACHE_DIR, TILE_CACHE_DISK_MB, TILE_CACHE_MEMORY_MB
+
+# Bump when combine_with_background changes how a tile is drawn.
+TILE_FORMAT_VERSION = 1
+
+
+def _file_fingerprint(path: str | None) -> str:
+    if not path:
+        return "-"
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def tile_key(
+    cid: str,
+    rarity: str,
+    name: str,
+    tile_size: int | None,
+    icon_path: str,
+    background_path: str,
+    font_path: str,
+) -> str:
+    """Content address of a finished tile.
+
+    Every input that changes the pixels is part of the key, including the
+    icon, background and font files (by mtime and size), so replacing any
+    asset naturally misses the old entries.
+    """
+    parts = [
+        str(TILE_FORMAT_VERSION),
+        cid.lower(),
+        rarity,
+        name,
+        str(tile_size or 0),
+        _file_fingerprint(icon_path),
+        _file_fingerprint(background_path),
+        _file_fingerprint(font_path),
+    ]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def _disk_path(key: str) -> str:
+    return os.path.join(TILE_CACHE_DIR, key[:2], f"{key}.png")
+
+
+def load_tile(key: str) -> Image.Image | None:
+    path = _disk_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with Image.open(path) as img:
+            tile = img.convert("RGBA")
+    except (UnidentifiedImageError, OSError):
+        return None
+    try:
+        # prune_tiles evicts by mtime, so a hit marks the tile recently used.
+        os.utime(path)
+    except OSError:
+        pass
+    return tile
+
+
+def store_tile(key: str, tile: Image.Image) -> None:
+    path = _disk_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        # Tiles are written once and read many times; favour write speed.
+        tile.save(tmp_path, "PNG", compress_level=1)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[DEBUG] Failed to cache tile {key}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def prune_tiles(max_bytes: int = TILE_CACHE_DISK_MB * 1024 * 1024) -> int:
+    """Delete the least recently used tiles once the disk cache outgrows ``max_bytes``.
+
+    Every render worker writes here, so rather than keeping a shared manifest
+    the directory is scanned and files are aged by mtime. Returns the number
+    of tiles removed.
+    """
+    entries = []
+    total = 0
+    for root, _, names in os.walk(TILE_CACHE_DIR):
+        for name in names:
+            if not name.endswith(".png"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, path))
+            total += st.st_size
+    if total <= max_bytes:
+        return 0
+
+    # Free a little more than needed so we do not prune on every pass.
+    target = int(max_bytes * 0.9)
+    entries.sort()
+    removed = 0
+    for _, size, path in entries:
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+class TileMemoryCache:
+    """Byte-bounded LRU of raw RGBA tiles kept in the bot process."""
+
+    def __init__(self, max_bytes: int = TILE_CACHE_MEMORY_MB * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[tuple[int, int], bytes]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> tuple[tuple[int, int], bytes] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, size: tuple[int, int], data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[key] = (size, data)
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+TILE_MEMORY_CACHE = TileMemoryCache()
@@ -0,0 +1,174 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable
+
+import aiohttp
+
+from src.config import EPIC_TOKEN_URL, TOKEN_REFRESH_AHEAD_SECONDS
+from src.epic_auth import IOS_TOKEN, EpicUser
+from src.singleflight import SingleFlight
+
+# Failed refreshes are retried this often until the refresh token expires.
+RETRY_SECONDS = 60
+
+
+def _deadline(expires_at: str, expires_in: int) -> float:
+    """Wall-clock expiry of an Epic ``*_expires_at`` timestamp."""
+    try:
+        return datetime.fromisoformat(expires_at.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return time.time() + expires_in
+
+
+@dataclass
+class _TrackedUser:
+    user: EpicUser
+    http: aiohttp.ClientSession
+    expires_at: float
+    refresh_expires_at: float
+    retry_at: float = 0.0
+    on_refresh: Callable[[EpicUser], Awaitable[bool]] | None = None
+
+
+class TokenManager:
+    """Keeps logged-in users' access tokens valid for the whole session.
+
+    A background task refreshes each token ``refresh_ahead`` seconds before
+    it expires, using the refresh_token grant. Callers that find a token
+    about to expire refresh it themselves; concurrent refreshes of the same
+    account share one request. The EpicUser (including ``raw``) is updated
+    in place and handed to ``on_refresh`` so the caller can persist it; if
+    that reports the session is gone, the account is no longer tracked.
+    """
+
+    def __init__(
+        self,
+        token_url: str = EPIC_TOKEN_URL,
+        client_token: str | None = IOS_TOKEN,
+        refresh_ahead: float = TOKEN_REFRESH_AHEAD_SECONDS,
+    ) -> None:
+        self.token_url = token_url
+        self.client_token = client_token
+        self.refresh_ahead = refresh_ahead
+        self._users: dict[str, _TrackedUser] = {}
+        self._refreshes = SingleFlight()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def __contains__(self, account_id: str) -> bool:
+        return account_id in self._users
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def track(
+        self,
+        user: EpicUser,
+        http: aiohttp.ClientSession,
+        on_refresh: Callable[[EpicUser], Awaitable[bool]] | None = None,
+    ) -> None:
+        self._users[user.account_id] = _TrackedUser(
+            user=user,
+            http=http,
+            expires_at=_deadline(user.expires_at, user.expires_in),
+            refresh_expires_at=_deadline(user.refresh_expires_at, user.refresh_expires),
+            on_refresh=on_refresh,
+        )
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    def forget(self, account_id: str) -> None:
+        self._users.pop(account_id, None)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def get_valid_token(self, account_id: str) -> str:
+        """Return an access token good for at least a little while longer.
+
+        Raises KeyError for accounts that are not tracked. If a refresh
+        fails, the current token is returned and the API call reports the
+        error as before.
+        """
+        tracked = self._users[account_id]
+        if tracked.expires_at - time.time() < min(self.refresh_ahead, 30):
+            await self.refresh(account_id)
+        return tracked.user.access_token
+
+    async def refresh(self, account_id: str) -> bool:
+        return await self._refreshes.do(account_id, lambda: self._refresh(account_id))
+
+    async def _refresh(self, account_id: str) -> bool:
+        tracked = self._users.get(account_id)
+        if tracked is None:
+            return False
+        if time.time() >= tracked.refresh_expires_at:
+            print(f"[DEBUG] Refresh token for {account_id} expired; login required.")
+            tracked.retry_at = float("inf")
+            return False
+
+        try:
+            async with tracked.http.post(
+                self.token_url,
+                headers={
+                    "Authorization": f"basic {self.client_token}",
+                    "Content-Type": "application/x-www-form-urlencoded",
+                },
+                data={"grant_type": "refresh_token", "refresh_token": tracked.user.refresh_token},
+            ) as resp:
+                data = await resp.json(content_type=None)
+                ok = resp.status == 200 and "access_token" in data
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            print(f"[DEBUG] Token refresh for {account_id} failed: {e}")
+            ok = False
+            data = {}
+
+        if not ok:
+            print(f"[DEBUG] Token refresh for {account_id} rejected: {data.get('errorCode', data)}")
+            tracked.retry_at = time.time() + RETRY_SECONDS
+            return False
+
+        tracked.user.update(data)
+        tracked.expires_at = _deadline(tracked.user.expires_at, tracked.user.expires_in)
+        tracked.refresh_expires_at = _deadline(tracked.user.refresh_expires_at, tracked.user.refresh_expires)
+        tracked.retry_at = 0.0
+        print(f"[DEBUG] Refreshed access token for {account_id}.")
+        if tracked.on_refresh is not None:
+            try:
+                if not await tracked.on_refresh(tracked.user):
+                    print(f"[DEBUG] Session for {account_id} is gone; no longer refreshing.")
+                    if self._users.get(account_id) is tracked:
+                        self.forget(account_id)
+            except Exception as e:
+                print(f"[DEBUG] Persisting refreshed token for {account_id} failed: {e}")
+        return True
+
+    def _next_refresh(self, tracked: _TrackedUser) -> float:
+        return max(tracked.expires_at - self.refresh_ahead, tracked.retry_at)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            due = [aid for aid, t in self._users.items() if self._next_refresh(t) <= now]
+            if due:
+                await asyncio.gather(*[self.refresh(aid) for aid in due], return_exceptions=True)
+                continue
+
+            upcoming = [self._next_refresh(t) for t in self._users.values()]
+            timeout = min(upcoming) - now if upcoming else None
+            if timeout == float("inf"):
+                timeout = None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+TOKENS = TokenManager()
@@ -0,0 +1,44 @@
+import asyncio
+import gzip
+import json
+import os
+
+import pytest
+
+import src.fortnite_api as fortnite_api
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "athena_profile.json.gz")
+
+
+class _Content:
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+
+    async def iter_chunked(self, size: int):
+        for start in range(0, len(self._body), size):
+            yield self._body[start:start + size]
+
+
+class _Response:
+    """Just enough of aiohttp.ClientResponse for _stream_athena."""
+
+    def __init__(self, body: bytes) -> None:
+        self.content = _Content(body)
+
+
+def _parse(athena: dict) -> tuple:
+    return (
+        fortnite_api.parse_locker_items(athena),
+        fortnite_api.parse_account_stats(athena),
+        fortnite_api.parse_locker_state(athena),
+    )
+
+
+def test_streamed_profile_parses_like_the_full_json():
+    if fortnite_api.ijson is None:
+        pytest.skip("ijson is not installed")
+    with gzip.open(FIXTURE, "rb") as f:
+        body = f.read()
+
+    streamed = asyncio.run(fortnite_api._stream_athena(_Response(body)))
+    assert _parse(streamed) == _parse(json.loads(body))
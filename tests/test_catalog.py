@@ -0,0 +1,131 @@
+import asyncio
+
+import aiohttp
+from aiohttp import web
+
+import src.catalog as catalog
+import src.fortnite_api as fortnite_api
+from src.catalog import CosmeticCatalog
+from src.config import cosmetic_sort_key
+
+
+def test_rows_from_another_process_get_sort_keys(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    reader = CosmeticCatalog(path)
+    reader.open()
+    writer = CosmeticCatalog(path)
+    writer.upsert_many([("cid_new", "New Skin", "Legendary", "outfit", None)])
+
+    assert reader.sort_keys(["CID_New"]) == {}
+    assert "cid_new" in reader.get_many(["CID_New"])
+    assert reader.sort_keys(["CID_New"]) == {"cid_new": cosmetic_sort_key("cid_new", "Legendary")}
+    reader.close()
+    writer.close()
+
+
+def test_unknown_banner_triggers_one_rate_limited_refresh(tmp_path, monkeypatch):
+    hits = []
+    banners = [{"id": "BRSeason01", "devName": "Season 1", "images": {"icon": "http://icons/s1.png"}}]
+
+    async def handler(request):
+        hits.append(request.path)
+        return web.json_response({"data": banners})
+
+    class _Cache:
+        async def fetch(self, session, cid, urls):
+            return f"/icons/{cid}.png"
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/v1/banners", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(catalog, "BANNERS_URL", f"http://127.0.0.1:{port}/v1/banners")
+        try:
+            async with aiohttp.ClientSession() as http:
+                first = await fortnite_api.download_and_prepare_banners(http, ["BRSeason01"])
+                # A banner released after the last check is picked up once the window passed...
+                banners.append({"id": "BRSeason02", "devName": "Season 2", "images": {"icon": "http://icons/s2.png"}})
+                await asyncio.sleep(0.3)
+                second = await asyncio.gather(*[
+                    fortnite_api.download_and_prepare_banners(http, ["BRSeason01", "BRSeason02"])
+                    for _ in range(5)
+                ])
+                # ...and ids fortnite-api does not list do not re-check again inside it.
+                third = await fortnite_api.download_and_prepare_banners(http, ["BRUnknown"])
+                return first, second, third
+        finally:
+            await runner.cleanup()
+
+    monkeypatch.setattr(fortnite_api, "CATALOG", catalog.CosmeticCatalog(str(tmp_path / "catalog.db")))
+    monkeypatch.setattr(fortnite_api, "IMAGE_CACHE", _Cache())
+    monkeypatch.setattr(fortnite_api, "BANNER_MISS_REFRESH_SECONDS", 0.2)
+    first, second, third = asyncio.run(scenario())
+    assert first == ["banner_brseason01"]
+    assert second == [["banner_brseason01", "banner_brseason02"]] * 5
+    assert third == []
+    assert len(hits) == 2
+    fortnite_api.CATALOG.close()
+
+
+def test_unknown_ids_sort_deterministically_after_known_ones(tmp_path, monkeypatch):
+    known = [
+        ("cid_common", "Common Skin", "Common", "outfit", None),
+        ("cid_legendary", "Legendary Skin", "Legendary", "outfit", None),
+        ("eid_rare", "Rare Emote", "Rare", "emote", None),
+    ]
+    unknown = ["CID_Unreleased_B", "cid_unreleased_a", "eid_encrypted"]
+    async def not_found(cosmetic_id, session):
+        return None
+
+    catalog_ = CosmeticCatalog(str(tmp_path / "catalog.db"))
+    catalog_.upsert_many(known)
+    monkeypatch.setattr(fortnite_api, "CATALOG", catalog_)
+    monkeypatch.setattr(fortnite_api, "_fetch_cosmetic_entry", not_found)
+
+    ids = [row[0] for row in known] + unknown
+    first = asyncio.run(fortnite_api.sort_ids_by_rarity(ids, None))
+    second = asyncio.run(fortnite_api.sort_ids_by_rarity(list(reversed(ids)), None))
+
+    assert first == second == [
+        "cid_legendary", "cid_common", "cid_unreleased_a", "CID_Unreleased_B", "eid_rare", "eid_encrypted",
+    ]
+    catalog_.close()
+
+
+def test_ids_fortnite_api_does_not_know_are_not_asked_again(tmp_path, monkeypatch):
+    requests = []
+
+    class _NotFound:
+        status = 404
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class _Session:
+        def get(self, url, **kwargs):
+            requests.append(url)
+            return _NotFound()
+
+    catalog_ = CosmeticCatalog(str(tmp_path / "catalog.db"))
+    monkeypatch.setattr(fortnite_api, "CATALOG", catalog_)
+
+    async def resolve():
+        return await fortnite_api.get_cosmetic_infos(["CID_Encrypted"], _Session())
+
+    first = asyncio.run(resolve())
+    second = asyncio.run(resolve())
+    assert first == second == [{"id": "CID_Encrypted", "rarity": "Common", "name": "Unknown"}]
+    assert len(requests) == 1
+
+    # The next dump may list it; the negative entry must not hide it.
+    catalog_.load_dump({"data": [{"id": "CID_Encrypted", "name": "Revealed", "rarity": {"displayValue": "Epic"}}]})
+    assert asyncio.run(resolve())[0]["name"] == "Revealed"
+    assert catalog_.recent_misses(["cid_encrypted"]) == set()
+    catalog_.close()
@@ -0,0 +1,71 @@
+import pytest
+
+from src.config import (
+    ITEM_ORDER_RANK,
+    RARITY_PRIORITY,
+    classify_items,
+    classify_template,
+    cosmetic_sort_key,
+    get_cosmetic_type,
+)
+
+
+@pytest.mark.parametrize("template_id, expected", [
+    ("AthenaCharacter:CID_001_Athena_Commando_F_Default", ("cid_001_athena_commando_f_default", "Skins")),
+    ("AthenaBackpack:BID_004_BlackKnight", ("bid_004_blackknight", "Back Blings")),
+    ("AthenaPetCarrier:PetCarrier_001_Dog", ("petcarrier_001_dog", "Back Blings")),
+    ("AthenaPickaxe:Pickaxe_ID_013_TeslaCoil", ("pickaxe_id_013_teslacoil", "Pickaxes")),
+    ("AthenaDance:EID_Floss", ("eid_floss", "Emotes")),
+    ("AthenaDance:SPID_001_Basic", ("spid_001_basic", "Sprays")),
+    ("AthenaDance:Emoji_Cool", ("emoji_cool", "Others")),
+    ("AthenaDance:Toy_001_Ball", ("toy_001_ball", "Others")),
+    ("AthenaGlider:Umbrella_Buckets", ("umbrella_buckets", "Gliders")),
+    ("AthenaItemWrap:Wrap_001_Arctic", ("wrap_001_arctic", "Wraps")),
+    ("AthenaLoadingScreen:LSID_001_Test", ("lsid_001_test", "Others")),
+])
+def test_template_prefixes(template_id, expected):
+    assert classify_template(template_id) == expected
+
+
+@pytest.mark.parametrize("template_id", [
+    "",
+    "AthenaCharacter:DefaultSkin",  # no underscore: not a listed cosmetic
+    "HomebaseBannerIcon:BRS_Season01",
+    "Currency:MtxPurchased",
+])
+def test_non_cosmetic_templates_are_skipped(template_id):
+    assert classify_template(template_id) is None
+
+
+@pytest.mark.parametrize("cosmetic_id, expected", [
+    ("CID_001_Athena_Commando_F_Default", "Skins"),
+    ("Character_Test", "Skins"),
+    ("Gadget_AlienSignalDetector", "Back Blings"),
+    ("HappyPickaxe", "Pickaxes"),
+    ("HalloweenScythe", "Pickaxes"),
+    ("Umbrella_Buckets", "Gliders"),
+    ("Duo_Umbrella", "Gliders"),
+    ("Squad_Umbrella", "Gliders"),
+    ("Solo_Umbrella", "Gliders"),
+    ("Banner_BRS01", "Banners"),
+    ("AthenaDance:EID_Floss", "Emotes"),
+    ("LSID_001_Test", "Others"),
+])
+def test_bare_ids(cosmetic_id, expected):
+    assert get_cosmetic_type(cosmetic_id) == expected
+
+
+def test_classify_items_groups_a_profile():
+    items = {
+        "g1": {"templateId": "AthenaCharacter:CID_001_A"},
+        "g2": {"templateId": "AthenaGlider:Umbrella_B"},
+        "g3": {"templateId": "Currency:MtxPurchased"},
+        "g4": {"attributes": {}},
+    }
+    assert classify_items(items) == {"Skins": ["cid_001_a"], "Gliders": ["umbrella_b"]}
+
+
+def test_mythic_ids_sort_as_mythic_whatever_the_api_says():
+    mythic = cosmetic_sort_key("Pickaxe_Lockjaw", "Rare")
+    assert mythic[:2] == (ITEM_ORDER_RANK["Pickaxes"], RARITY_PRIORITY["Mythic"])
+    assert cosmetic_sort_key("pickaxe_id_999_test", "Rare")[1] == RARITY_PRIORITY["Rare"]
@@ -0,0 +1,49 @@
+import asyncio
+
+from src.epic_auth import DeviceCode, DeviceCodePoller
+
+
+class _Response:
+    def __init__(self, status, body):
+        self.status = status
+        self._body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def json(self, content_type=None):
+        if isinstance(self._body, Exception):
+            raise self._body
+        return self._body
+
+
+class _FakeHttp:
+    """Answers each device-code poll with the next scripted response."""
+
+    def __init__(self, responses):
+        self._responses = list(responses)
+
+    def post(self, url, **kwargs):
+        return _Response(*self._responses.pop(0))
+
+
+def test_malformed_poll_responses_do_not_kill_the_loop():
+    http = _FakeHttp([
+        (400, ["not", "a", "dict"]),
+        (400, {"errorCode": 1234}),
+        (500, RuntimeError("boom")),
+        (200, {"access_token": "token"}),
+    ])
+    device = DeviceCode("https://example.invalid", "code", interval=0.01, expires_in=5)
+
+    async def scenario():
+        poller = DeviceCodePoller()
+        try:
+            return await asyncio.wait_for(poller.wait(http, device, "test"), 5)
+        finally:
+            await poller.stop()
+
+    assert asyncio.run(scenario()) == {"access_token": "token"}
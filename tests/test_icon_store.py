@@ -0,0 +1,21 @@
+import shutil
+
+from PIL import Image
+
+import src.icon_store as icon_store
+from src.config import PLACEHOLDER_IMAGE
+
+
+def test_placeholder_copies_are_not_stored_as_icons(tmp_path, monkeypatch):
+    monkeypatch.setattr(icon_store, "ICON_STORE_DIR", str(tmp_path / "store"))
+    copy = tmp_path / "cid_missing.png"
+    shutil.copy(PLACEHOLDER_IMAGE, copy)
+
+    assert icon_store.load_icon(str(copy), 192) is None
+    assert not icon_store.ingest_icon(str(copy), (192,))
+    assert not (tmp_path / "store" / "192" / "cid_missing.rgba").exists()
+
+    placeholder = icon_store.load_icon(PLACEHOLDER_IMAGE, 192)
+    with Image.open(PLACEHOLDER_IMAGE) as img:
+        expected = img.convert("RGBA").resize((192, 192), Image.Resampling.LANCZOS)
+    assert placeholder.tobytes() == expected.tobytes()
@@ -0,0 +1,34 @@
+import io
+import os
+import shutil
+
+from PIL import Image
+
+from src.config import PLACEHOLDER_IMAGE
+from src.image_cache import ImageCache
+
+
+def test_legacy_placeholder_copies_are_not_adopted(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    shutil.copy(PLACEHOLDER_IMAGE, cache.path_for("cid_placeholder"))
+    Image.new("RGBA", (8, 8), (255, 0, 0, 255)).save(cache.path_for("cid_real"))
+
+    assert cache.status("cid_placeholder") == "miss"
+    assert not os.path.exists(cache.path_for("cid_placeholder"))
+    # Remembered as a failed fetch, so it is retried once the negative TTL ends.
+    assert cache.status("cid_placeholder") == "negative"
+    assert cache.status("cid_real") == "hit"
+    cache.close()
+
+
+def test_ids_differing_only_in_case_share_one_file(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    buf = io.BytesIO()
+    Image.new("RGBA", (8, 8), (0, 255, 0, 255)).save(buf, "PNG")
+
+    assert cache.store("CID_Mixed_Case", buf.getvalue())
+    assert cache.path_for("CID_Mixed_Case") == cache.path_for("cid_mixed_case")
+    assert cache.status("cid_mixed_case") == "hit"
+    # The manifest row survives lookups in either case.
+    assert cache.status("CID_MIXED_CASE") == "hit"
+    cache.close()
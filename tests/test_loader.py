@@ -0,0 +1,49 @@
+import asyncio
+import io
+
+from PIL import Image
+
+import loader
+from src.image_cache import ImageCache
+from src.image_utils import tile_args
+
+
+class _Response:
+    def __init__(self, body: bytes) -> None:
+        self.status = 200
+        self._body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def read(self) -> bytes:
+        return self._body
+
+
+class _Session:
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+
+    def get(self, url, **kwargs):
+        return _Response(self._body)
+
+
+def test_mixed_case_ids_warm_the_keys_the_bot_reads(tmp_path, monkeypatch):
+    ids_file = tmp_path / "skins.txt"
+    ids_file.write_text("CID_Mixed_Case_Test\n\n")
+    cache = ImageCache(str(tmp_path / "icons"))
+    monkeypatch.setattr(loader, "IMAGE_CACHE", cache)
+    buf = io.BytesIO()
+    Image.new("RGBA", (8, 8), (0, 0, 255, 255)).save(buf, "PNG")
+
+    skin_ids = loader.read_skin_ids(str(ids_file))
+    assert asyncio.run(loader.download_image(_Session(buf.getvalue()), skin_ids[0], retries=0))
+
+    assert cache.status("cid_mixed_case_test") == "hit"
+    warmed = tile_args({"id": skin_ids[0], "name": "Test", "rarity": "Rare"}, 308)
+    looked_up = tile_args({"id": "cid_mixed_case_test", "name": "Test", "rarity": "Rare"}, 308)
+    assert warmed["cache_key"] == looked_up["cache_key"]
+    cache.close()
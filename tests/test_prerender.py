@@ -0,0 +1,56 @@
+import asyncio
+
+import src.prerender as prerender
+
+
+def test_saturated_jobs_are_deferred_and_tokens_freed(monkeypatch):
+    saturated = {"value": True}
+    monkeypatch.setattr(prerender, "cpu_saturated", lambda: saturated["value"])
+    rendered = []
+
+    async def render(user_id, category):
+        rendered.append((user_id, category))
+
+    async def scenario():
+        scheduler = prerender.PrerenderScheduler(render, retry_delay=0.05)
+        scheduler.start()
+        scheduler.schedule(1, ["Emotes", "Skins"])
+        await asyncio.sleep(0.12)
+        during = list(rendered)
+        saturated["value"] = False
+        await asyncio.sleep(0.2)
+        state = dict(scheduler._tokens), dict(scheduler._queued)
+        await scheduler.stop()
+        return during, state
+
+    during, (tokens, queued) = asyncio.run(scenario())
+    assert during == []
+    assert rendered == [(1, "Skins"), (1, "Emotes")]
+    assert tokens == {} and queued == {}
+
+
+def test_ended_session_answers_waiters_and_refresh_keeps_running_renders():
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def render():
+        started.set()
+        await release.wait()
+        return "image"
+
+    async def scenario():
+        scheduler = prerender.PrerenderScheduler(lambda user_id, category: render())
+        waiter = asyncio.create_task(scheduler.run(1, "Skins", 0, render))
+        await started.wait()
+        scheduler.drop_queued(1)
+        release.set()
+        kept = await waiter
+
+        release.clear()
+        started.clear()
+        waiter = asyncio.create_task(scheduler.run(1, "Skins", 0, render))
+        await started.wait()
+        scheduler.cancel(1)
+        return kept, await waiter
+
+    assert asyncio.run(scenario()) == ("image", None)
@@ -0,0 +1,26 @@
+import src.image_utils as image_utils
+from src.config import RARITY_BACKGROUNDS_V1
+
+
+def _args(tile_size):
+    return {
+        "cid": "CID_Missing_Test",
+        "name": "Missing",
+        "rarity": "Epic",
+        "background_path": RARITY_BACKGROUNDS_V1["Epic"],
+        "tile_size": tile_size,
+        "cache_key": None,
+    }
+
+
+def test_blank_tile_when_icon_and_placeholder_are_unreadable(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_utils, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(image_utils, "load_icon", lambda path, size: None)
+
+    size, data = image_utils._process_cosmetic_item(_args(128))
+    assert size == (128, 128)
+    assert data == bytes(128 * 128 * 4)
+
+    background = image_utils._load_background(RARITY_BACKGROUNDS_V1["Epic"])
+    size, _ = image_utils._process_cosmetic_item(_args(None))
+    assert size == (background.width, background.width)
@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+import bot
+from src.prerender import PrerenderScheduler
+from src.session_store import MemorySessionStore
+
+USER = 9
+
+
+class _Calls:
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def defer(self, **kwargs):
+        pass
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+
+
+def _interaction():
+    calls = _Calls()
+    interaction = SimpleNamespace(
+        type=discord.InteractionType.component,
+        data={"custom_id": bot.BTN_REFRESH},
+        user=SimpleNamespace(id=USER),
+        response=calls,
+        followup=calls,
+    )
+    return interaction, calls
+
+
+def _run_refresh(monkeypatch, outcome):
+    async def refresh_locker(user_id, data):
+        return outcome
+
+    monkeypatch.setattr(bot, "refresh_locker", refresh_locker)
+    monkeypatch.setattr(bot, "SESSIONS", MemorySessionStore())
+
+    async def scenario():
+        scheduler = PrerenderScheduler(lambda user_id, category: asyncio.sleep(0))
+        monkeypatch.setattr(bot, "PRERENDER", scheduler)
+        scheduler._queue = asyncio.PriorityQueue()  # queued, but no workers draining it
+        await bot.SESSIONS.set(USER, {"items": {"Skins": ["cid_a"]}, "locker": {"rvn": 1, "items": {}}, "version": 0})
+        scheduler.schedule(USER, ["Skins"])
+        token = scheduler._tokens[USER]
+        interaction, calls = _interaction()
+        await bot.on_interaction(interaction)
+        return scheduler._tokens.get(USER) is token, calls.sent
+
+    return asyncio.run(scenario())
+
+
+def test_failed_refresh_keeps_queued_prerenders(monkeypatch):
+    kept, sent = _run_refresh(monkeypatch, "Error refreshing locker (401)")
+    assert kept
+    assert sent == ["❌ Error refreshing locker (401)"]
+
+
+def test_successful_refresh_requeues_prerenders(monkeypatch):
+    kept, sent = _run_refresh(monkeypatch, {"Skins"})
+    assert not kept
+    assert sent[0].startswith("✅ Locker refreshed")
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import uuid
+from types import SimpleNamespace
+
+import bot
+import src.fortnite_api as fortnite_api
+import src.icon_store as icon_store
+import src.image_utils as image_utils
+import src.tile_cache as tile_cache
+from src.catalog import CosmeticCatalog
+from src.render_pool import RENDER_POOL
+from src.session_store import MemorySessionStore
+
+USERS = 50
+SKINS = ["cid_001_test", "cid_002_test", "cid_003_test"]
+
+
+async def _map_in_process(fn, args):
+    return [fn(arg) for arg in args]
+
+
+def test_concurrent_renders_do_not_share_files(tmp_path, monkeypatch):
+    catalog = CosmeticCatalog(str(tmp_path / "catalog" / "catalog.sqlite3"))
+    catalog.upsert_many([(cid, f"Skin {cid}", "Epic", "outfit", None) for cid in SKINS])
+
+    async def no_downloads(ids, session):
+        return None
+
+    # Every id is in the catalog and no icon is downloaded, so no request is made.
+    monkeypatch.setattr(bot, "HTTP", SimpleNamespace(session=None))
+    monkeypatch.setattr(fortnite_api, "CATALOG", catalog)
+    monkeypatch.setattr(image_utils, "download_cosmetic_images", no_downloads)
+    monkeypatch.setattr(image_utils, "CACHE_DIR", str(tmp_path / "icons"))
+    monkeypatch.setattr(icon_store, "ICON_STORE_DIR", str(tmp_path / "icon_store"))
+    monkeypatch.setattr(tile_cache, "TILE_CACHE_DIR", str(tmp_path / "tiles"))
+    monkeypatch.setattr(image_utils, "start_render_pool", lambda: None)
+    monkeypatch.setattr(RENDER_POOL, "map", _map_in_process)
+    monkeypatch.setattr(bot, "RENDER_SPILL_TO_DISK", True)
+    monkeypatch.setattr(bot, "SESSIONS", MemorySessionStore(max_entries=USERS))
+    monkeypatch.chdir(tmp_path)
+
+    sessions = [
+        {
+            "username": f"user{i}",
+            "session_id": uuid.uuid4().hex,
+            "items": {"Skins": list(SKINS)},
+            "sorted_ids": {},
+            "version": 0,
+        }
+        for i in range(USERS)
+    ]
+
+    async def render_all():
+        for user_id, data in enumerate(sessions):
+            await bot.SESSIONS.set(user_id, data)
+        return await asyncio.gather(
+            *[bot.render_category(user_id, data, "Skins") for user_id, data in enumerate(sessions)]
+        )
+
+    images = asyncio.run(render_all())
+
+    assert all(image is not None for image in images)
+    paths = [image.path for image in images]
+    assert len(set(paths)) == USERS
+    # Every user's footer differs, so identical bytes would mean a clobbered render.
+    assert len({image.data for image in images}) == USERS
+    for data, image in zip(sessions, images):
+        assert os.path.dirname(image.path) == bot.session_output_dir(data)
+        with open(image.path, "rb") as f:
+            assert f.read() == image.data
@@ -0,0 +1,217 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+
+from src.epic_auth import EpicUser
+from src.image_utils import RenderedImage
+from src.session_store import (
+    CompactTemplates,
+    MemorySessionStore,
+    RedisSessionStore,
+    SQLiteSessionStore,
+    serialize_session,
+)
+
+USER = 42
+
+
+def make_session() -> dict:
+    return {
+        "info_str": "info",
+        "items": {"Skins": ["cid_001_test", "cid_002_test"], "Emotes": ["eid_test"]},
+        "username": "tester",
+        "epic_user": EpicUser.from_dict({"account_id": "abc", "access_token": "t0", "displayName": "tester"}),
+        "session_id": "s1",
+        "sorted_ids": {"Skins": ["cid_002_test", "cid_001_test"]},
+        "current": ("Skins", 0),
+        "locker": {"rvn": 7, "items": {"guid-1": "AthenaCharacter:cid_001_test"}},
+        "version": 0,
+    }
+
+
+def make_image(label: str, page: int = 0) -> RenderedImage:
+    return RenderedImage(data=label.encode() * 100, filename=f"{label}.png", page=page, page_count=2)
+
+
+@pytest.fixture(scope="module")
+def redis_url():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = fakeredis.TcpFakeServer(("127.0.0.1", port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"redis://127.0.0.1:{port}/0"
+    server.shutdown()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def make_store(request, tmp_path):
+    """Factory for stores of one backend; every store it returns shares the same data,
+    like the bot processes of one deployment."""
+    backend = request.param
+    created = []
+
+    def factory(idle_ttl=60, on_evict=None):
+        if backend == "memory":
+            if created:
+                pytest.skip("memory sessions are private to one store")
+            store = MemorySessionStore(idle_ttl=idle_ttl, on_evict=on_evict)
+        elif backend == "sqlite":
+            store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), idle_ttl=idle_ttl, on_evict=on_evict)
+        else:
+            url = request.getfixturevalue("redis_url")
+            prefix = f"test:{request.node.name}:"
+            store = RedisSessionStore(url, idle_ttl=idle_ttl, on_evict=on_evict, prefix=prefix)
+        created.append(store)
+        return store
+
+    return factory
+
+
+def run(coro, *stores):
+    """Run a scenario and close its stores on the same event loop."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            for store in stores:
+                await store.close()
+
+    return asyncio.run(main())
+
+
+def test_round_trip_keeps_images_out_of_the_session(make_store):
+    store = make_store()
+
+    async def scenario():
+        await store.set(USER, make_session())
+        assert await store.put_image(USER, "Skins", 0, make_image("skins"), version=0)
+        return await store.get(USER), await store.get_image(USER, "Skins", 0)
+
+    data, image = run(scenario(), store)
+    assert dict(data["items"]) == make_session()["items"]
+    assert data["epic_user"].access_token == "t0"
+    assert data["current"] == ("Skins", 0)
+    assert data["locker"]["rvn"] == 7
+    assert isinstance(data["locker"]["items"], CompactTemplates)
+    assert dict(data["locker"]["items"]) == make_session()["locker"]["items"]
+    assert "images" not in data
+    assert image == make_image("skins")
+    assert "images" not in serialize_session(make_session())
+    assert "sorted_ids" not in serialize_session(make_session())
+
+
+def test_sorted_order_survives_get_until_the_version_changes(make_store):
+    store = make_store()
+    sorts = []
+
+    async def open_skins():
+        # What render_category does on every click.
+        data = await store.get(USER)
+        if "Skins" not in data["sorted_ids"]:
+            sorts.append(data["version"])
+            data["sorted_ids"]["Skins"] = sorted(data["items"]["Skins"])
+        return data["sorted_ids"]["Skins"]
+
+    async def scenario():
+        session = make_session()
+        session["sorted_ids"] = {}
+        await store.set(USER, session)
+        await open_skins()
+        await open_skins()
+        await store.update(USER, {"version": 1}, stale_categories={"Skins"})
+        await open_skins()
+        return await open_skins()
+
+    assert run(scenario(), store) == ["cid_001_test", "cid_002_test"]
+    # Memory sessions are the same dict, where the refresh handler pops the
+    # stale order itself; decoded sessions start over at the new version.
+    assert sorts == ([0] if isinstance(store, MemorySessionStore) else [0, 1])
+
+
+def test_update_merges_fields_and_never_recreates_a_session(make_store):
+    store = make_store()
+
+    async def scenario():
+        await store.set(USER, make_session())
+        assert await store.update(USER, {"current": ("Emotes", 1)})
+        assert await store.update(USER, {"locker": {"rvn": 8, "items": {}}})
+        data = await store.get(USER)
+        await store.pop(USER)
+        updated = await store.update(USER, {"current": ("Skins", 0)})
+        stored = await store.put_image(USER, "Skins", 0, make_image("late"), version=0)
+        return data, updated, stored, await store.get(USER)
+
+    data, updated, stored, after_exit = run(scenario(), store)
+    assert data["current"] == ("Emotes", 1)
+    assert data["locker"]["rvn"] == 8
+    assert data["username"] == "tester"
+    assert not updated and not stored and after_exit is None
+
+
+def test_refresh_drops_stale_images_and_rejects_old_renders(make_store):
+    store = make_store()
+
+    async def scenario():
+        await store.set(USER, make_session())
+        await store.put_image(USER, "Skins", 0, make_image("skins"), version=0)
+        await store.put_image(USER, "Skins", 1, make_image("skins", page=1), version=0)
+        await store.put_image(USER, "Emotes", 0, make_image("emotes"), version=0)
+        await store.update(USER, {"version": 1}, stale_categories={"Skins"})
+        late = await store.put_image(USER, "Skins", 0, make_image("old"), version=0)
+        return (
+            late,
+            await store.get_image(USER, "Skins", 0),
+            await store.get_image(USER, "Skins", 1),
+            await store.get_image(USER, "Emotes", 0),
+            await store.put_image(USER, "Skins", 0, make_image("new"), version=1),
+        )
+
+    late, skins, skins_page_2, emotes, fresh = run(scenario(), store)
+    assert not late
+    assert skins is None and skins_page_2 is None
+    assert emotes == make_image("emotes")
+    assert fresh
+
+
+def test_concurrent_writers_do_not_lose_each_others_fields(make_store):
+    first = make_store()
+    second = make_store()
+
+    async def scenario():
+        await first.set(USER, make_session())
+        # Both handlers read the session, then each writes back its own change.
+        await first.get(USER)
+        await second.get(USER)
+        await first.update(USER, {"current": ("Pickaxes", 0)})
+        await second.update(USER, {"locker": {"rvn": 9, "items": {}}}, stale_categories={"Skins"})
+        return await first.get(USER)
+
+    data = run(scenario(), first, second)
+    assert data["current"] == ("Pickaxes", 0)
+    assert data["locker"]["rvn"] == 9
+
+
+def test_sweep_evicts_idle_sessions(make_store):
+    evicted = []
+    store = make_store(idle_ttl=0.2, on_evict=lambda user_id, data: evicted.append((user_id, data["session_id"])))
+
+    async def scenario():
+        await store.set(USER, make_session())
+        await store.set(USER + 1, make_session())
+        await asyncio.sleep(0.1)
+        await store.get(USER + 1)
+        await asyncio.sleep(0.15)
+        first = await store.sweep()
+        expired = await store.get(USER)
+        await asyncio.sleep(0.25)
+        return first, expired, await store.sweep()
+
+    first, expired, second = run(scenario(), store)
+    assert first == 1 and expired is None
+    assert second == 1
+    assert evicted == [(USER, "s1"), (USER + 1, "s1")]
@@ -0,0 +1,80 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import aiohttp
+from aiohttp import web
+
+from src.epic_auth import EpicUser
+from src.session_store import SQLiteSessionStore
+from src.token_manager import TokenManager
+
+USER = 7
+
+
+def _stamp(seconds: float) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat().replace("+00:00", "Z")
+
+
+async def _oauth_server():
+    """Local stand-in for Epic's token endpoint answering refresh_token grants."""
+    async def token(request):
+        form = await request.post()
+        assert form["grant_type"] == "refresh_token"
+        return web.json_response({
+            "access_token": "fresh",
+            "expires_in": 7200,
+            "expires_at": _stamp(7200),
+            "refresh_token": "refresh-2",
+            "refresh_expires": 28800,
+            "refresh_expires_at": _stamp(28800),
+            "account_id": "abc",
+        })
+
+    app = web.Application()
+    app.router.add_post("/token", token)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/token"
+
+
+def test_refreshed_token_is_visible_to_other_processes(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+
+    async def scenario():
+        runner, url = await _oauth_server()
+        writer = SQLiteSessionStore(path)
+        reader = SQLiteSessionStore(path)
+        tokens = TokenManager(token_url=url, client_token="client", refresh_ahead=0)
+        try:
+            user = EpicUser.from_dict({
+                "account_id": "abc",
+                "access_token": "stale",
+                "expires_in": 0,
+                "expires_at": _stamp(-1),
+                "refresh_token": "refresh-1",
+                "refresh_expires_at": _stamp(3600),
+                "displayName": "tester",
+            })
+            await writer.set(USER, {"epic_user": user, "items": {}, "version": 0})
+            async with aiohttp.ClientSession() as http:
+                tokens.track(user, http, on_refresh=lambda u: writer.update(USER, {"epic_user": u}))
+                assert await tokens.get_valid_token("abc") == "fresh"
+
+                stored = await reader.get(USER)
+                assert stored["epic_user"].access_token == "fresh"
+                assert stored["epic_user"].refresh_token == "refresh-2"
+
+                # Once the session is gone the account stops being refreshed.
+                await writer.pop(USER)
+                assert await tokens.refresh("abc")
+                assert "abc" not in tokens
+        finally:
+            await tokens.stop()
+            await writer.close()
+            await reader.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())